@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""Fan-out benchmark for state updates sent to a growing number of remotes.
+
+This script measures the cost of distributing one state transition to N
+remotes (1 to 1000 by default) and writes the results as JSON:
+
+- encoding: CPU time for building the update of all remotes, comparing the
+  former approach (one JSON payload per remote, listing all remotes) against
+  the shared broadcast buffer
+- dispatch: time spent on the dispatcher thread for queuing the update
+- delivery: time from the transition until every remote received it
+
+All remotes point to one single local sink server. They use distinct loopback
+addresses (127.0.x.y), which all reach the sink on Linux.
+
+Usage: python bench/bench_fanout.py [--counts 1,10,100,1000] [--output FILE]
+"""
+
+import json
+import sys
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from os import environ as env
+from os.path import abspath, dirname, join
+from selectors import EVENT_READ, DefaultSelector
+from socket import AF_INET, SO_REUSEADDR, SOCK_STREAM, SOL_SOCKET, socket
+from threading import Condition, Thread
+from time import monotonic, perf_counter
+from typing import Any, Dict, List
+
+BASE_DIR: str = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, join(BASE_DIR, "src"))
+env.setdefault("HARDWARE_BACKEND", "sim")
+env.setdefault("LOG_LEVEL", "warning")
+env.setdefault("GIT_VERSION", "benchmark")
+
+# pylint: disable=C0413,E0401
+from broadcast import Broadcast  # noqa: E402
+from constants import HARDWARE_BACKEND, PY_VERSION, SW_VERSION  # noqa: E402
+from home_office_light import HomeOfficeLight  # noqa: E402
+from remote import HomeOfficeLightRemote  # noqa: E402
+
+TIMEOUT_SEC: float = 30
+STATES: List[str] = ["call", "video", "none"]
+
+
+class Sink:
+    """Local TCP server which accepts updates of any number of remotes on one
+    single thread and counts the received payloads."""
+
+    def __init__(self) -> None:
+        self._sock: socket = socket(AF_INET, SOCK_STREAM)
+        self._sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self._sock.bind(("", 0))
+        self._sock.listen(1024)
+        self._sock.setblocking(False)
+        self.port: int = self._sock.getsockname()[1]
+        self.received: int = 0
+        self._cond: Condition = Condition()
+        self._selector: DefaultSelector = DefaultSelector()
+        self._selector.register(self._sock, EVENT_READ)
+        Thread(target=self._run, daemon=True).start()
+
+    def _run(self) -> None:
+        """Accept connections and count all payload lines."""
+        while True:
+            for key, _ in self._selector.select():
+                if key.fileobj is self._sock:
+                    conn, _ = self._sock.accept()
+                    conn.setblocking(False)
+                    self._selector.register(conn, EVENT_READ, b"")
+                    continue
+                conn = key.fileobj  # type: ignore
+                data: bytes = conn.recv(65536)
+                if not data:
+                    self._selector.unregister(conn)
+                    conn.close()
+                    continue
+                lines: List[bytes] = (key.data + data).split(b"\n")
+                self._selector.modify(conn, EVENT_READ, lines[-1])
+                payloads: int = sum(
+                    1 for line in lines[:-1] if line.startswith(b"{")
+                )
+                if payloads:
+                    with self._cond:
+                        self.received += payloads
+                        self._cond.notify_all()
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        """Block until the given number of payloads has been received."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self.received >= count, timeout
+            )
+
+
+def legacy_encode(
+    state: str, remotes: List[HomeOfficeLightRemote]
+) -> List[bytes]:
+    """Build all requests like the former implementation did, i.e. a full
+    JSON payload per remote."""
+    requests: List[bytes] = []
+    for remote in remotes:
+        payload: str = json.dumps(
+            {
+                "state": state,
+                "remotes": [other.ip_addr for other in remotes],
+            },
+            indent=None,
+        )
+        requests.append(
+            (
+                f"GET /remote HTTP/1.1\n"
+                f"Host: {remote.ip_addr}\n"
+                "\n"
+                f"{payload}\n"
+            ).encode("ascii")
+        )
+    return requests
+
+
+def broadcast_encode(
+    state: str, remotes: List[HomeOfficeLightRemote]
+) -> List[List[memoryview]]:
+    """Build all requests from one shared broadcast buffer."""
+    update: Broadcast = Broadcast.create(
+        state, 0, (remote.ip_addr for remote in remotes)
+    )
+    body: memoryview = memoryview(update.body)
+    # pylint: disable=W0212
+    return [[memoryview(remote._request_head), body] for remote in remotes]
+
+
+def time_ms(func: Any, repeat: int) -> float:
+    """Measure the mean runtime of a function in milliseconds."""
+    start: float = perf_counter()
+    for _ in range(repeat):
+        func()
+    return round((perf_counter() - start) / repeat * 1000, 4)
+
+
+def bench_count(
+    light: HomeOfficeLight, sink: Sink, remotes: List[HomeOfficeLightRemote]
+) -> Dict[str, Any]:
+    """Run all measurements for the currently registered remotes."""
+    repeat: int = max(1, 1000 // len(remotes))
+    result: Dict[str, Any] = {
+        "remotes": len(remotes),
+        "encode_legacy_ms": time_ms(
+            lambda: legacy_encode("call", remotes), repeat
+        ),
+        "encode_broadcast_ms": time_ms(
+            lambda: broadcast_encode("call", remotes), repeat
+        ),
+    }
+
+    dispatch: List[float] = []
+    delivery: List[float] = []
+    for i in range(5):
+        expected: int = sink.received + len(remotes)
+        start: float = monotonic()
+        light.set_state(STATES[i % len(STATES)]).result(TIMEOUT_SEC)
+        dispatch.append(monotonic() - start)
+        if sink.wait_for(expected, TIMEOUT_SEC):
+            delivery.append(monotonic() - start)
+    result["dispatch_ms"] = round(min(dispatch) * 1000, 3)
+    result["delivery_ms"] = (
+        round(min(delivery) * 1000, 3) if delivery else None
+    )
+    return result
+
+
+def main() -> None:
+    """Run the benchmark for all remote counts and write the results."""
+    parser: ArgumentParser = ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--counts", default="1,10,100,1000")
+    parser.add_argument("--output", help="JSON file (default: stdout)")
+    args: Namespace = parser.parse_args()
+
+    if HARDWARE_BACKEND != "sim":
+        sys.exit("The benchmark requires HARDWARE_BACKEND=sim.")
+
+    light: HomeOfficeLight = HomeOfficeLight()
+    sink: Sink = Sink()
+    remotes: List[HomeOfficeLightRemote] = []
+    results: List[Dict[str, Any]] = []
+    for count in sorted(int(x) for x in args.counts.split(",")):
+        while len(remotes) < count:
+            num: int = len(remotes) + 1
+            remote: HomeOfficeLightRemote = HomeOfficeLightRemote(
+                f"127.0.{num // 250}.{num % 250 + 1}", sink.port
+            )
+            light.add_or_update_remote(remote).result(TIMEOUT_SEC)
+            remotes.append(light.get_remote(remote))  # type: ignore
+        results.append(bench_count(light, sink, remotes))
+    light.on_exit()
+
+    output: str = json.dumps(
+        {
+            "sw_version": SW_VERSION,
+            "py_version": PY_VERSION,
+            "timestamp": datetime.now().isoformat(),
+            "config": vars(args),
+            "fanout": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
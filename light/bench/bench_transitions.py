@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+
+"""End-to-end latency benchmark for the HomeOfficeLight.
+
+This script drives the real HomeOfficeLight, Backend and Frontend against the
+simulated hardware backend and a number of local stand-in remote servers.
+Backend and frontend are served by their WSGI server (see WSGI_SERVER) on
+ephemeral local ports and driven over real HTTP connections, optionally while
+other clients put load on them. It measures the latency of the following paths
+and writes the results as JSON:
+
+- backend HTTP request (/state/set) -> response received, LED frame committed
+- frontend HTTP request (/state?set) -> response received, LED frame committed
+- bell button edge -> buzzer output
+- state transition -> all remotes notified
+- throughput of a burst of state transitions
+
+Usage: python bench/bench_transitions.py [--remotes N] [--load N]
+                                        [--output FILE]
+"""
+
+import json
+import sys
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from http.client import HTTPConnection
+from os import environ as env
+from os.path import abspath, dirname, join
+from socket import (
+    AF_INET,
+    SO_REUSEADDR,
+    SOCK_STREAM,
+    SOL_SOCKET,
+    create_connection,
+    socket,
+)
+from threading import Condition, Event, Thread
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+BASE_DIR: str = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, join(BASE_DIR, "src"))
+env.setdefault("HARDWARE_BACKEND", "sim")
+env.setdefault("LOG_LEVEL", "warning")
+env.setdefault("GIT_VERSION", "benchmark")
+
+# pylint: disable=C0413,E0401
+from backend import Backend  # noqa: E402
+from constants import (  # noqa: E402
+    HARDWARE_BACKEND,
+    LEDS_BOTTOM,
+    LEDS_TOP,
+    PIN_BUTTON,
+    PIN_BUZZER,
+    PY_VERSION,
+    SW_VERSION,
+    WSGI_SERVER,
+    WSGI_THREADS,
+)
+from frontend import Frontend  # noqa: E402
+from hardware import simulation  # noqa: E402
+from home_office_light import HomeOfficeLight  # noqa: E402
+from remote import HomeOfficeLightRemote  # noqa: E402
+
+TIMEOUT_SEC: float = 5
+QUIET_PERIOD_SEC: float = 1
+
+# Conditions identifying the LED frame of each static state
+LED_SIGNATURES: Dict[str, Callable[[simulation.Frame], bool]] = {
+    "none": lambda frame: all(
+        color == (0, 0, 0) for color in frame.pixels
+    ),
+    "call": lambda frame: frame.pixels[LEDS_BOTTOM[0]] == (255, 150, 0)
+    and frame.pixels[LEDS_TOP[0]] == (0, 0, 0),
+    "video": lambda frame: frame.pixels[LEDS_TOP[0]] == (255, 0, 0)
+    and frame.pixels[LEDS_BOTTOM[0]] == (0, 0, 0),
+}
+
+
+class RemoteStandIn:
+    """Local TCP server which acts like a remote and records the arrival time
+    of every state update."""
+
+    def __init__(self) -> None:
+        self._sock: socket = socket(AF_INET, SOCK_STREAM)
+        self._sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(64)
+        self.port: int = self._sock.getsockname()[1]
+        self.updates: List[Tuple[float, str]] = []
+        self._cond: Condition = Condition()
+        Thread(target=self._run, daemon=True).start()
+
+    def _run(self) -> None:
+        """Accept connections and serve them."""
+        while True:
+            conn, _ = self._sock.accept()
+            Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket) -> None:
+        """Read all JSON payload lines from a connection."""
+        buffer: bytes = b""
+        with conn:
+            while True:
+                data: bytes = conn.recv(4096)
+                if not data:
+                    return
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    if line.startswith(b"{"):
+                        self._record(json.loads(line)["state"])
+
+    def _record(self, state: str) -> None:
+        """Store a received state update."""
+        with self._cond:
+            self.updates.append((monotonic(), state))
+            self._cond.notify_all()
+
+    def wait_for_state(
+        self, state: str, since: float, timeout: float
+    ) -> Optional[float]:
+        """Block until the given state has been received after the given point
+        in time and return the arrival time, or None on timeout."""
+
+        def find() -> Optional[float]:
+            for time, update in self.updates:
+                if time >= since and update == state:
+                    return time
+            return None
+
+        with self._cond:
+            self._cond.wait_for(find, timeout)
+            return find()
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Calculate latency statistics of the given samples (in seconds)."""
+    if not samples:
+        return {"samples": 0}
+    ordered: List[float] = sorted(samples)
+
+    def percentile(pct: float) -> float:
+        index: int = min(len(ordered) - 1, int(pct / 100 * len(ordered)))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "samples": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def wait_for_leds(state: str, since: float) -> Optional[float]:
+    """Wait until the LED strip shows the given state and return the time."""
+    frame: Optional[simulation.Frame] = simulation.strips[-1].wait_for_frame(
+        LED_SIGNATURES[state], since, TIMEOUT_SEC
+    )
+    return frame.time if frame else None
+
+
+def start_server(app: Union[Backend, Frontend]) -> int:
+    """Serve a flask application on an ephemeral local port in the background
+    and return the port once it accepts connections."""
+    with socket(AF_INET, SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+    Thread(target=app.run, args=(port, "127.0.0.1"), daemon=True).start()
+
+    deadline: float = monotonic() + TIMEOUT_SEC
+    while True:
+        try:
+            create_connection(("127.0.0.1", port)).close()
+            return port
+        except OSError:
+            if monotonic() > deadline:
+                raise
+            sleep(0.05)
+
+
+class LoadGenerator:
+    """Clients which keep requesting a URL over their own keep-alive HTTP
+    connections until stopped."""
+
+    def __init__(self, port: int, url: str, clients: int) -> None:
+        self.requests: int = 0
+        self._stop: Event = Event()
+        self._threads: List[Thread] = [
+            Thread(target=self._run, args=(port, url), daemon=True)
+            for _ in range(clients)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self, port: int, url: str) -> None:
+        """Request the URL in a loop."""
+        conn: HTTPConnection = HTTPConnection(
+            "127.0.0.1", port, timeout=TIMEOUT_SEC
+        )
+        while not self._stop.is_set():
+            try:
+                conn.request("GET", url)
+                conn.getresponse().read()
+                self.requests += 1
+            except OSError:
+                conn.close()
+
+    def stop(self) -> None:
+        """Stop all clients."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def bench_http_to_leds(
+    port: int, url: str, iterations: int, load: int
+) -> Dict[str, Any]:
+    """Measure the latency from a HTTP request to its response and to the LED
+    frame commit, while the given number of clients put load on the same
+    server."""
+    responses: List[float] = []
+    samples: List[float] = []
+    states: List[str] = ["call", "video", "none"]
+    generator: LoadGenerator = LoadGenerator(
+        port, url.split("?")[0], load
+    )
+    conn: HTTPConnection = HTTPConnection(
+        "127.0.0.1", port, timeout=TIMEOUT_SEC
+    )
+    for i in range(iterations):
+        state: str = states[i % len(states)]
+        start: float = monotonic()
+        conn.request("GET", url + state)
+        conn.getresponse().read()
+        responses.append(monotonic() - start)
+        done: Optional[float] = wait_for_leds(state, start)
+        if done is not None:
+            samples.append(done - start)
+    conn.close()
+    generator.stop()
+    return {
+        "response": summarize(responses),
+        "leds": summarize(samples),
+        "load_requests": generator.requests,
+    }
+
+
+def bench_button_to_buzzer(
+    light: HomeOfficeLight, iterations: int
+) -> Dict[str, Any]:
+    """Measure the latency from a bell button edge to the buzzer output."""
+    samples: List[float] = []
+    for _ in range(iterations):
+        light.set_state("video")
+        sleep(0.1)
+        start: float = monotonic()
+        simulation.GPIO.inject_edge(PIN_BUTTON, 1)
+        change: Optional[simulation.PinChange] = (
+            simulation.GPIO.wait_for_output(PIN_BUZZER, 1, start, TIMEOUT_SEC)
+        )
+        if change:
+            samples.append(change.time - start)
+        simulation.GPIO.inject_edge(PIN_BUTTON, 0)
+
+        # Wait for the buzzer sequence to complete before the next run
+        simulation.GPIO.wait_for_output(
+            PIN_BUZZER, 0, monotonic() + 0.5, TIMEOUT_SEC
+        )
+    light.set_state("none")
+    return summarize(samples)
+
+
+def bench_transition_to_remotes(
+    light: HomeOfficeLight, stand_ins: List[RemoteStandIn], iterations: int
+) -> Dict[str, Any]:
+    """Measure the latency from a transition until all remotes received the
+    new state."""
+    samples: List[float] = []
+    states: List[str] = ["call", "video", "none"]
+    for i in range(iterations):
+        state: str = states[i % len(states)]
+        start: float = monotonic()
+        light.set_state(state)
+        arrivals: List[Optional[float]] = [
+            stand_in.wait_for_state(state, start, TIMEOUT_SEC)
+            for stand_in in stand_ins
+        ]
+        if stand_ins and all(arrival is not None for arrival in arrivals):
+            samples.append(max(arrivals) - start)  # type: ignore
+    return summarize(samples)
+
+
+def bench_burst(
+    light: HomeOfficeLight, stand_ins: List[RemoteStandIn], size: int
+) -> Dict[str, Any]:
+    """Fire a burst of transitions and measure the throughput as well as the
+    time until LEDs and remotes have settled on the final state."""
+    states: List[str] = ["call", "video", "none"]
+    final: str = states[(size - 1) % len(states)]
+    start: float = monotonic()
+    for i in range(size - 1):
+        light.set_state(states[i % len(states)])
+    light.set_state(final).result(TIMEOUT_SEC)
+    submitted: float = monotonic()
+
+    # Give everything time to settle, then check the final outcome
+    sleep(QUIET_PERIOD_SEC)
+    settled: List[float] = []
+    frames: List[simulation.Frame] = list(simulation.strips[-1].frames)
+    if frames and LED_SIGNATURES[final](frames[-1]):
+        first: simulation.Frame = frames[-1]
+        for frame in reversed(frames):
+            if not LED_SIGNATURES[final](frame):
+                break
+            first = frame
+        settled.append(first.time)
+    remotes_settled: int = 0
+    updates: int = 0
+    for stand_in in stand_ins:
+        updates += sum(1 for time, _ in stand_in.updates if time >= start)
+        if stand_in.updates and stand_in.updates[-1][1] == final:
+            settled.append(stand_in.updates[-1][0])
+            remotes_settled += 1
+
+    return {
+        "transitions": size,
+        "duration_ms": round((submitted - start) * 1000, 3),
+        "transitions_per_sec": round(size / (submitted - start), 1),
+        "remotes_on_final_state": remotes_settled,
+        "updates_per_remote": round(updates / len(stand_ins), 1)
+        if stand_ins
+        else None,
+        "settled_ms": round((max(settled) - start) * 1000, 3)
+        if settled
+        else None,
+    }
+
+
+def main() -> None:
+    """Run all benchmarks and write the results."""
+    parser: ArgumentParser = ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--button-iterations", type=int, default=10)
+    parser.add_argument("--remotes", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=300)
+    parser.add_argument(
+        "--load",
+        type=int,
+        default=0,
+        help="number of clients loading the server during HTTP benchmarks",
+    )
+    parser.add_argument("--output", help="JSON file (default: stdout)")
+    args: Namespace = parser.parse_args()
+
+    if HARDWARE_BACKEND != "sim":
+        sys.exit("The benchmark requires HARDWARE_BACKEND=sim.")
+
+    light: HomeOfficeLight = HomeOfficeLight()
+    backend: Backend = Backend(light)
+    frontend: Frontend = Frontend(
+        light, join(BASE_DIR, "templates"), join(BASE_DIR, "static")
+    )
+    backend_port: int = start_server(backend)
+    frontend_port: int = start_server(frontend)
+    stand_ins: List[RemoteStandIn] = [
+        RemoteStandIn() for _ in range(args.remotes)
+    ]
+    for stand_in in stand_ins:
+        light.add_or_update_remote(
+            HomeOfficeLightRemote("127.0.0.1", stand_in.port)
+        )
+
+    results: Dict[str, Any] = {
+        "sw_version": SW_VERSION,
+        "py_version": PY_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "config": dict(
+            vars(args), wsgi_server=WSGI_SERVER, wsgi_threads=WSGI_THREADS
+        ),
+        "latency": {
+            "backend_http_to_leds": bench_http_to_leds(
+                backend_port, "/state/set?state=", args.iterations, args.load
+            ),
+            "frontend_http_to_leds": bench_http_to_leds(
+                frontend_port, "/state?set=", args.iterations, args.load
+            ),
+            "button_to_buzzer": bench_button_to_buzzer(
+                light, args.button_iterations
+            ),
+            "transition_to_remotes": bench_transition_to_remotes(
+                light, stand_ins, args.iterations
+            ),
+        },
+        "throughput": bench_burst(light, stand_ins, args.burst),
+    }
+    frontend.stop()
+    backend.stop()
+    light.on_exit()
+
+    output: str = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
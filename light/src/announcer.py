@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""Python module which announces state changes to all remotes at once via UDP
+multicast or broadcast."""
+
+from ipaddress import IPv4Address
+from json import dumps
+from socket import (
+    AF_INET,
+    IP_MULTICAST_TTL,
+    IPPROTO_IP,
+    SO_BROADCAST,
+    SOCK_DGRAM,
+    SOL_SOCKET,
+    socket,
+)
+from threading import Lock
+from typing import Any, Dict
+
+from aux.scheduler import scheduler
+from broadcast import Broadcast
+from constants import (
+    ANNOUNCE_MAX_SIZE,
+    ANNOUNCE_MULTICAST_TTL,
+    ANNOUNCE_REPEAT_INTERVAL,
+    ANNOUNCE_REPEATS,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Announcer:
+    """Helper class which sends one datagram per state version to a multicast
+    group or broadcast address, so any number of remotes can be updated with
+    a constant effort. Since datagrams may get lost, every announcement is
+    repeated a few times; listeners must ignore repetitions of the version
+    they have seen last. The version starts over after a restart.
+
+    Datagram format (one-line JSON):
+    {"v": <version>, "s": "<state>", "r": ["<ip address>", ...]}
+    The remote list is left out if it does not fit into one datagram."""
+
+    def __init__(self, address: str, port: int) -> None:
+        self.address: str = address
+        self.port: int = port
+        self.tx_count: int = 0
+        self.tx_errors: int = 0
+        self._version: int = -1
+        self._lock: Lock = Lock()
+        self._sock: socket = socket(AF_INET, SOCK_DGRAM)
+
+        if IPv4Address(address).is_multicast:
+            self._sock.setsockopt(
+                IPPROTO_IP, IP_MULTICAST_TTL, ANNOUNCE_MULTICAST_TTL
+            )
+        else:
+            self._sock.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+        logger.info("Announcing state changes to %s:%d.", address, port)
+
+    @staticmethod
+    def encode(update: Broadcast) -> bytes:
+        """Encode an update as compact datagram."""
+        content: Dict[str, Any] = {
+            "v": update.version,
+            "s": update.state,
+            "r": list(update.remotes),
+        }
+        datagram: bytes = dumps(content, separators=(",", ":")).encode(
+            "ascii"
+        )
+        if len(datagram) > ANNOUNCE_MAX_SIZE:
+            del content["r"]
+            datagram = dumps(content, separators=(",", ":")).encode("ascii")
+        return datagram
+
+    def announce(self, update: Broadcast) -> None:
+        """Send an update right away and schedule its repetitions."""
+        datagram: bytes = self.encode(update)
+        with self._lock:
+            self._version = update.version
+        self._send(update.version, datagram)
+        for repeat in range(1, ANNOUNCE_REPEATS):
+            scheduler.schedule(
+                lambda: self._send(update.version, datagram),
+                ANNOUNCE_REPEAT_INTERVAL * repeat,
+            )
+
+    def _send(self, version: int, datagram: bytes) -> None:
+        """Send one datagram, unless a newer version has been announced in the
+        meantime."""
+        with self._lock:
+            if version != self._version:
+                return
+            try:
+                self._sock.sendto(datagram, (self.address, self.port))
+                self.tx_count += 1
+            except OSError as err:
+                logger.error(
+                    "Could not announce state to %s:%d (%s).",
+                    self.address,
+                    self.port,
+                    err,
+                )
+                self.tx_errors += 1
+
+    def close(self) -> None:
+        """Stop announcing and close the socket."""
+        with self._lock:
+            self._version = -1
+            self._sock.close()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""Helper module for serializing commands through one single writer thread."""
+
+from concurrent.futures import Future
+from queue import Queue
+from threading import Lock, Thread, current_thread
+from typing import Any, Callable, Optional, Tuple
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# future, function, arguments
+Command = Tuple["Future[Any]", Callable[..., Any], Tuple[Any, ...]]
+
+
+class Dispatcher:
+    """Helper class which runs submitted commands one after another on one
+    single background thread, in the order they were submitted. Every command
+    is represented by a future, which the caller may wait for or ignore.
+
+    Commands submitted by a running command are run immediately instead of
+    being queued, so they cannot deadlock while waiting for each other."""
+
+    def __init__(self, name: str = "dispatcher") -> None:
+        self.name: str = name
+        self._queue: "Queue[Optional[Command]]" = Queue()
+        self._lock: Lock = Lock()
+        self._thread: Optional[Thread] = None
+        self._stopped: bool = False
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> "Future[Any]":
+        """Enqueue a command and return its future immediately. Once the
+        dispatcher has been stopped, the command is canceled instead."""
+        future: "Future[Any]" = Future()
+        if current_thread() is self._thread:
+            self._execute((future, func, args))
+            return future
+
+        with self._lock:
+            if self._stopped:
+                future.cancel()
+                return future
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+            self._queue.put((future, func, args))
+        return future
+
+    def stop(self) -> None:
+        """Run all pending commands and stop the background thread."""
+        with self._lock:
+            self._stopped = True
+            thread: Optional[Thread] = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+        if thread is not current_thread():
+            thread.join()
+
+    @staticmethod
+    def _execute(command: Command) -> None:
+        """Run one single command and resolve its future."""
+        future, func, args = command
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except Exception as exc:  # pylint: disable=W0703
+            logger.exception("Command %s failed.", func)
+            future.set_exception(exc)
+
+    def _run(self) -> None:
+        """Run all commands as soon as they are submitted."""
+        while True:
+            command: Optional[Command] = self._queue.get()
+            if command is None:
+                return
+            self._execute(command)
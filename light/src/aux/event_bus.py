@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""Helper module for publishing small events to any number of subscribers,
+e.g. for pushing live updates to the web frontend."""
+
+from collections import deque
+from threading import Condition, Lock
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from constants import EVENTS_QUEUE_SIZE
+
+# event name, payload
+Event = Tuple[str, Dict[str, Any]]
+
+
+class Subscription:
+    """Bounded event queue of one single subscriber. If the subscriber cannot
+    keep up, the queue is marked as overflowed instead of growing further."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity: int = capacity
+        self.overflowed: bool = False
+        self.closed: bool = False
+        self._events: Deque[Event] = deque()
+        self._cond: Condition = Condition()
+
+    def put(self, event: Event) -> None:
+        """Add an event to the queue and wake up the subscriber."""
+        with self._cond:
+            if len(self._events) >= self.capacity:
+                self.overflowed = True
+                self._events.clear()
+            else:
+                self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> List[Event]:
+        """Block until events are available and fetch all of them at once.
+        Returns an empty list on timeout or if the subscription was closed."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._events or self.overflowed or self.closed,
+                timeout,
+            )
+            events: List[Event] = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self) -> None:
+        """Close the subscription and wake up the subscriber."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventBus:
+    """Helper class which distributes published events to all current
+    subscribers. Publishing is cheap if no one is listening.
+
+    Note: The bus must not log anything itself, since new log entries are
+    published as events as well."""
+
+    def __init__(self, capacity: int = EVENTS_QUEUE_SIZE) -> None:
+        self.capacity: int = capacity
+        self._subscriptions: Set[Subscription] = set()
+        self._lock: Lock = Lock()
+
+    def subscribe(self) -> Subscription:
+        """Register a new subscriber."""
+        subscription: Subscription = Subscription(self.capacity)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscriber."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+        subscription.close()
+
+    def has_subscribers(self) -> bool:
+        """Check if anyone is currently listening."""
+        return bool(self._subscriptions)
+
+    def publish(self, name: str, data: Dict[str, Any]) -> None:
+        """Hand over an event to all current subscribers."""
+        with self._lock:
+            subscriptions: List[Subscription] = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put((name, data))
+
+    def close(self) -> None:
+        """Close all subscriptions."""
+        with self._lock:
+            subscriptions: List[Subscription] = list(self._subscriptions)
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.close()
+
+
+# Shared instance to be used by all modules
+event_bus: EventBus = EventBus()
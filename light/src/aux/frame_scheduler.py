@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""Helper module for running animations at a fixed frame rate."""
+
+from time import monotonic, sleep
+
+
+class FrameScheduler:
+    """Helper class which paces an animation loop at a fixed frame rate based
+    on the monotonic clock. Frame deadlines are calculated from the start time,
+    so time spent on rendering does not accumulate as drift. If the loop falls
+    behind, the missed frames are dropped instead of being played late."""
+
+    def __init__(self, fps: int):
+        self.fps: int = fps
+        self.interval: float = 1 / fps
+        self.reset()
+
+    def reset(self) -> None:
+        """Restart the frame counting and statistics."""
+        self.start_time: float = monotonic()
+        self.frame: int = 0
+        self.frames_shown: int = 0
+        self.frames_dropped: int = 0
+        self.overruns: int = 0
+
+    def wait(self) -> int:
+        """Sleep until the next frame is due and return its index, counted
+        from the start of the animation."""
+        self.frame += 1
+        deadline: float = self.start_time + self.frame * self.interval
+        now: float = monotonic()
+        if now > deadline:
+            # Skip any frames whose deadline has already passed
+            self.overruns += 1
+            late_frames: int = int((now - deadline) / self.interval)
+            self.frames_dropped += late_frames
+            self.frame += late_frames
+            deadline += late_frames * self.interval
+        if deadline > now:
+            sleep(deadline - now)
+        self.frames_shown += 1
+        return self.frame
+
+    def get_fps(self) -> float:
+        """Returns the frame rate achieved since the start."""
+        elapsed: float = monotonic() - self.start_time
+        return self.frames_shown / elapsed if elapsed > 0 else 0.0
@@ -4,7 +4,7 @@
 
 from datetime import datetime, timedelta
 from math import cos, pi
-from typing import Tuple
+from typing import List, Tuple
 
 
 class PulseWave:
@@ -19,14 +19,30 @@ class PulseWave:
         """Resets the internal timestamp."""
         self.start_time: datetime = datetime.now()
 
+    @staticmethod
+    def get_value(phase: float) -> float:
+        """Returns the cosine value at the given phase (in periods) as float
+        between 0 and 1."""
+        return 0.5 * (cos(2 * pi * phase) + 1)
+
     def get(self) -> float:
         """Returns the current cosine value as float between 0 and 1."""
         time: float = (datetime.now() - self.start_time).total_seconds()
-        cosine: float = cos(2 * pi * time / self.period.total_seconds())
-        return 0.5 * (cosine + 1)
+        return self.get_value(time / self.period.total_seconds())
+
+    def scale_value(self, value: float) -> int:
+        """Scales a value between 0 and 1 to an integer."""
+        return int(value * (self.scale[1] - self.scale[0]) + self.scale[0])
 
     def get_scaled(self) -> int:
         """Returns the current cosine value as scaled integer."""
-        return int(
-            self.get() * (self.scale[1] - self.scale[0]) + self.scale[0]
-        )
+        return self.scale_value(self.get())
+
+    def get_frames(self, fps: int) -> List[int]:
+        """Precomputes the scaled values of one entire period as a lookup
+        table, sampled at the given frame rate."""
+        num_frames: int = max(1, round(self.period.total_seconds() * fps))
+        return [
+            self.scale_value(self.get_value(frame / num_frames))
+            for frame in range(num_frames)
+        ]
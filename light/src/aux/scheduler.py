@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""Helper module for running delayed tasks from one central thread."""
+
+from datetime import timedelta
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition, Thread, current_thread
+from time import monotonic
+from typing import Any, Callable, Iterator, List, Optional
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ScheduledTask:
+    """Handle of one single task registered at a scheduler."""
+
+    def __init__(
+        self,
+        owner: "Scheduler",
+        deadline: float,
+        number: int,
+        func: Callable[[], Any],
+    ):
+        self.deadline: float = deadline
+        self.number: int = number
+        self.func: Callable[[], Any] = func
+        self.canceled: bool = False
+        self.done: bool = False
+        self._scheduler: "Scheduler" = owner
+
+    def cancel(self) -> None:
+        """Cancel this task if it has not been run yet."""
+        self._scheduler.cancel(self)
+
+    def __lt__(self, other: "ScheduledTask") -> bool:
+        """Order tasks by deadline and, if equal, by registration order."""
+        return (self.deadline, self.number) < (other.deadline, other.number)
+
+
+class Scheduler:
+    """Helper class which runs registered tasks at their deadline on one single
+    background thread. The thread sleeps exactly until the next deadline, which
+    is always measured using the monotonic clock.
+
+    Note: All tasks share the same thread, so they must not block for long."""
+
+    def __init__(self) -> None:
+        self._queue: List[ScheduledTask] = []
+        self._num_canceled: int = 0
+        self._counter: Iterator[int] = count()
+        self._cond: Condition = Condition()
+        self._thread: Optional[Thread] = None
+        self._stopped: bool = False
+
+    def schedule(
+        self, func: Callable[[], Any], delay: timedelta
+    ) -> ScheduledTask:
+        """Register a function to be run once the given delay has elapsed."""
+        with self._cond:
+            task: ScheduledTask = ScheduledTask(
+                self,
+                monotonic() + delay.total_seconds(),
+                next(self._counter),
+                func,
+            )
+            heappush(self._queue, task)
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            elif self._queue[0] is task:
+                self._cond.notify()
+        return task
+
+    def cancel(self, task: ScheduledTask) -> None:
+        """Cancel a registered task. Canceled tasks are removed lazily from the
+        queue, which is compacted as soon as they make up half of it."""
+        with self._cond:
+            if task.canceled or task.done:
+                return
+            task.canceled = True
+            self._num_canceled += 1
+            if self._num_canceled > len(self._queue) // 2:
+                self._queue = [x for x in self._queue if not x.canceled]
+                heapify(self._queue)
+                self._num_canceled = 0
+
+    def stop(self) -> None:
+        """Drop all pending tasks and stop the background thread."""
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._num_canceled = 0
+            self._cond.notify()
+        if self._thread and self._thread is not current_thread():
+            self._thread.join()
+
+    def get_num_of_tasks(self) -> int:
+        """Fetch the number of tasks still waiting to be run."""
+        with self._cond:
+            return len(self._queue) - self._num_canceled
+
+    def _next_task(self) -> Optional[ScheduledTask]:
+        """Block until the next task is due and remove it from the queue.
+        Returns None if the scheduler has been stopped."""
+        with self._cond:
+            while not self._stopped:
+                while self._queue and self._queue[0].canceled:
+                    heappop(self._queue)
+                    self._num_canceled -= 1
+
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+
+                remaining: float = self._queue[0].deadline - monotonic()
+                if remaining <= 0:
+                    task: ScheduledTask = heappop(self._queue)
+                    task.done = True
+                    return task
+                self._cond.wait(remaining)
+        return None
+
+    def _run(self) -> None:
+        """Run all tasks as soon as they are due."""
+        while True:
+            task: Optional[ScheduledTask] = self._next_task()
+            if task is None:
+                return
+            try:
+                task.func()
+            except Exception:  # pylint: disable=W0703
+                logger.exception("Scheduled task %s failed.", task.func)
+
+
+# Shared instance to be used by all modules
+scheduler: Scheduler = Scheduler()
@@ -1,31 +1,33 @@
 #!/usr/bin/env python3
 
-"""Helper module for realizing simple timeouts using threads."""
+"""Helper module for realizing simple timeouts using the central scheduler."""
 
-from datetime import datetime, timedelta
-from threading import Thread
-from time import sleep
-from typing import Any, Callable
+from datetime import timedelta
+from typing import Any, Callable, Optional
 
+from aux.scheduler import ScheduledTask, Scheduler, scheduler
 
-class Timeout(Thread):
-    """Timeout helper class, which will run a specific task as a thread."""
 
-    def __init__(self, func: Callable[[], Any], timeout: timedelta):
-        super().__init__(target=self._run, daemon=True)
+class Timeout:
+    """Timeout helper class, which will run a specific task once elapsed."""
+
+    def __init__(
+        self,
+        func: Callable[[], Any],
+        timeout: timedelta,
+        task_scheduler: Scheduler = scheduler,
+    ):
         self.func: Callable[[], Any] = func
         self.timeout: timedelta = timeout
-        self._canceled: bool = False
+        self._scheduler: Scheduler = task_scheduler
+        self._task: Optional[ScheduledTask] = None
 
-    def _run(self) -> None:
-        """Start the timeout and when elapsed, run the registered function."""
-        end: datetime = datetime.now() + self.timeout
-        while datetime.now() < end:
-            if self._canceled:
-                return
-            sleep(0.1)
-        self.func()
+    def start(self) -> None:
+        """Start the timeout; the registered function will be run on the
+        scheduler's thread when elapsed."""
+        self._task = self._scheduler.schedule(self.func, self.timeout)
 
     def cancel(self) -> None:
         """Cancel this timeout immediately."""
-        self._canceled = True
+        if self._task:
+            self._task.cancel()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""Helper module for serving a flask application with a production WSGI
+server, or with the Werkzeug development server as fallback."""
+
+from typing import Any
+
+from flask import Flask
+
+from constants import (
+    WSGI_KEEP_ALIVE_CONNECTIONS,
+    WSGI_REQUEST_TIMEOUT,
+    WSGI_SERVER,
+    WSGI_SHUTDOWN_TIMEOUT,
+    WSGI_THREADS,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WsgiServer:
+    """Wrapper around a WSGI server, which serves a flask application from a
+    fixed pool of worker threads with HTTP/1.1 keep-alive and can be stopped
+    gracefully from any thread.
+
+    Note: Long-running requests like event streams or long-polls occupy one
+    worker each for their whole duration, so the applications must not serve
+    more than WSGI_MAX_LONG_REQUESTS of them at once."""
+
+    def __init__(self, app: Flask, port: int, host: str = "0.0.0.0") -> None:
+        self.app: Flask = app
+        self.port: int = port
+        self.host: str = host
+        self.production: bool = False
+        self._server: Any = None
+
+        if WSGI_SERVER == "cheroot":
+            try:
+                # pylint: disable=C0415
+                from cheroot.wsgi import Server
+
+                self._server = Server(
+                    (host, port),
+                    app,
+                    numthreads=WSGI_THREADS,
+                    server_name=app.name,
+                    timeout=int(WSGI_REQUEST_TIMEOUT.total_seconds()),
+                    shutdown_timeout=int(
+                        WSGI_SHUTDOWN_TIMEOUT.total_seconds()
+                    ),
+                )
+                self._server.keep_alive_conn_limit = (
+                    WSGI_KEEP_ALIVE_CONNECTIONS
+                )
+                self.production = True
+            except ImportError:
+                logger.warning(
+                    "Package cheroot not found; falling back to the "
+                    "development server."
+                )
+
+        if not self.production:
+            # pylint: disable=C0415
+            from werkzeug.serving import make_server
+
+            self._server = make_server(host, port, app, threaded=True)
+
+    def run(self) -> None:
+        """Serve requests until the server is stopped."""
+        logger.info(
+            "Serving %s on %s:%d (%s).",
+            self.app.name,
+            self.host,
+            self.port,
+            "cheroot" if self.production else "development server",
+        )
+        if self.production:
+            self._server.safe_start()
+        else:
+            self._server.serve_forever()
+
+    def stop(self) -> None:
+        """Stop accepting new connections and let pending requests finish
+        (up to the shutdown timeout)."""
+        logger.info("Stopping %s.", self.app.name)
+        if self.production:
+            self._server.stop()
+        else:
+            self._server.shutdown()
@@ -2,16 +2,26 @@
 
 """HomeOfficeLight backend python module."""
 
+from concurrent.futures import Future, wait
 from json import dumps
-from typing import Optional
+from threading import BoundedSemaphore
+from typing import Any, List, Optional, Tuple
 from uuid import uuid4
 
-from flask import Flask, request
+from flask import Flask, Response, request
 
-from constants import PORT_REMOTE
+from aux.wsgi_server import WsgiServer
+from constants import (
+    PORT_REMOTE,
+    STATE_COMMAND_TIMEOUT,
+    STATE_WAIT_TIMEOUT,
+    WSGI_BUSY_RETRY_AFTER,
+    WSGI_MAX_LONG_REQUESTS,
+)
 from logger import get_logger
 from home_office_light import HomeOfficeLight
 from remote import HomeOfficeLightRemote
+from snapshot import LightSnapshot
 
 logger = get_logger(__name__)
 
@@ -23,6 +33,15 @@ class Backend:
         self.hol_instance: HomeOfficeLight = hol_instance
         self.app: Flask = Flask(__name__)
         self.app.secret_key = uuid4().hex
+        self._server: Optional[WsgiServer] = None
+        self._wait_slots: BoundedSemaphore = BoundedSemaphore(
+            WSGI_MAX_LONG_REQUESTS
+        )
+
+        # Encoded response of the latest state version; the ETag prefix
+        # changes with every start, since the versions start over
+        self._etag_prefix: str = uuid4().hex[:8]
+        self._cached_response: Optional[Tuple[int, bytes]] = None
 
         @self.app.route("/state/get", methods=["GET"])
         def _state_get():
@@ -32,35 +51,113 @@ class Backend:
         def _state_set():
             return self.state()
 
-    def state(self) -> str:
+        @self.app.route("/state/wait", methods=["GET"])
+        def _state_wait():
+            return self.wait()
+
+    def state(self) -> Response:
         """Gets the bare state of the system and - if provided - updates a
-        remote registration."""
+        remote registration. Unless "async" is passed, the response is sent
+        after the requested changes have been carried out."""
+
+        futures: List["Future[Any]"] = self.register_remote()
+
+        new_state: Optional[str] = request.args.get("state")
+        if new_state:
+            futures.append(self.hol_instance.set_state(new_state))
+
+        if "async" not in request.args:
+            wait(futures, STATE_COMMAND_TIMEOUT.total_seconds())
+        return self.get_response(self.hol_instance.snapshot)
+
+    def wait(self) -> Response:
+        """Waits until the state version differs from the one passed by the
+        client or the timeout has elapsed, then gets the bare state of the
+        system. If provided, a remote registration is updated as well.
+        If too many clients are waiting already, 503 is returned instead."""
+
+        wait(self.register_remote(), STATE_COMMAND_TIMEOUT.total_seconds())
+
+        version: Optional[int] = request.args.get("version", type=int)
+        timeout: float = min(
+            request.args.get(
+                "timeout", STATE_WAIT_TIMEOUT.total_seconds(), type=float
+            ),
+            STATE_WAIT_TIMEOUT.total_seconds(),
+        )
+        if version is None:
+            return self.get_response(self.hol_instance.snapshot)
 
+        # Do not let long-polls occupy all workers of the server
+        if not self._wait_slots.acquire(blocking=False):
+            return Response(
+                "Too many pending requests.\n",
+                status=503,
+                mimetype="text/plain",
+                headers={
+                    "Retry-After": str(
+                        int(WSGI_BUSY_RETRY_AFTER.total_seconds())
+                    )
+                },
+            )
+        try:
+            return self.get_response(
+                self.hol_instance.wait_for_state_change(
+                    version, max(0, timeout)
+                )
+            )
+        finally:
+            self._wait_slots.release()
+
+    def register_remote(self) -> List["Future[Any]"]:
+        """Update a remote registration if requested by the client."""
         if "remote" in request.args:
             remote: HomeOfficeLightRemote = HomeOfficeLightRemote(
                 str(request.remote_addr), PORT_REMOTE
             )
+            remote.announce = "announce" in request.args
             logger.debug("Incoming HTTP request from %s.", remote)
-            self.hol_instance.on_remote_request(remote, True)
-        else:
-            logger.debug(
-                "Incoming HTTP request from IP %s.", request.remote_addr
-            )
+            return [self.hol_instance.on_remote_request(remote, True)]
 
-        new_state: Optional[str] = request.args.get("state")
-        if new_state:
-            self.hol_instance.set_state(new_state)
-
-        return dumps(
-            {
-                "state": self.hol_instance.get_state(),
-                "remotes": [
-                    remote.ip_addr for remote in self.hol_instance.remotes
-                ],
-            },
-            indent=None,
-        )
+        logger.debug("Incoming HTTP request from IP %s.", request.remote_addr)
+        return []
+
+    def get_response(self, snapshot: LightSnapshot) -> Response:
+        """Build the JSON response containing the bare state of the system.
+        The encoded response is cached per state version; if the client
+        already knows the version, it is answered with 304 Not Modified."""
+        version: int = snapshot.version
+        etag: str = f"{self._etag_prefix}-{version}"
+        if etag in request.if_none_match:
+            response: Response = Response(status=304)
+        else:
+            cached: Optional[Tuple[int, bytes]] = self._cached_response
+            if cached is None or cached[0] != version:
+                cached = (
+                    version,
+                    dumps(
+                        {
+                            "state": snapshot.state_name,
+                            "version": version,
+                            "remotes": [
+                                remote.ip_addr for remote in snapshot.remotes
+                            ],
+                        },
+                        indent=None,
+                    ).encode(),
+                )
+                self._cached_response = cached
+            response = Response(cached[1])
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
     def run(self, port, host: str = "0.0.0.0") -> None:
-        """Trigger the inner run method of the flask application."""
-        self.app.run(host, port)
+        """Serve the flask application until stopped."""
+        self._server = WsgiServer(self.app, port, host)
+        self._server.run()
+
+    def stop(self) -> None:
+        """Stop serving the flask application gracefully."""
+        if self._server:
+            self._server.stop()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+"""Python module with the encoded state update, which is sent to all
+remotes."""
+
+from dataclasses import dataclass
+from json import dumps
+from typing import Iterable, Tuple
+
+
+@dataclass(frozen=True)
+class Broadcast:
+    """Dataclass which holds the state update of one single state version.
+    The HTTP body is encoded once and shared by all remotes, which only add
+    their own request head."""
+
+    state: str
+    version: int
+    remotes: Tuple[str, ...]
+    body: bytes
+
+    @staticmethod
+    def create(
+        state: str, version: int, ip_addrs: Iterable[str]
+    ) -> "Broadcast":
+        """Encode the state and the addresses of all remotes."""
+        remotes: Tuple[str, ...] = tuple(ip_addrs)
+        # The payload must be sent as one-line JSON string (with trailing \n)
+        payload: str = dumps(
+            {"state": state, "remotes": list(remotes)}, indent=None
+        )
+        return Broadcast(
+            state, version, remotes, f"\n{payload}\n".encode("ascii")
+        )
@@ -7,7 +7,7 @@ import sys
 from datetime import timedelta as td
 from os import environ as env
 from socket import getfqdn, gethostbyname
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # General
 HOSTNAME: str = getfqdn()
@@ -28,7 +28,16 @@ LOG_LEVEL: int = logging.INFO
 for level, properties in LOG_MAPPING.items():
     if properties[0].lower() == env["LOG_LEVEL"].lower():
         LOG_LEVEL = level
-LOG_BUFFER_CAPACITY: int = 1000
+LOG_BUFFER_CAPACITY: int = int(env.get("LOG_BUFFER_CAPACITY", 1000))
+LOG_PAGE_SIZE: int = 100
+LOG_QUERY_LIMIT: int = 1000
+LOG_QUEUE_SIZE: int = int(env.get("LOG_QUEUE_SIZE", 10000))
+# Behaviour when the log queue is full: "drop" or "block" (up to the timeout)
+LOG_QUEUE_POLICY: str = env.get("LOG_QUEUE_POLICY", "drop").lower()
+LOG_QUEUE_TIMEOUT: td = td(milliseconds=100)
+# Directory of the on-disk log archive (disabled if not set)
+LOG_ARCHIVE_DIR: Optional[str] = env.get("LOG_ARCHIVE_DIR") or None
+LOG_ARCHIVE_SEGMENTS: int = int(env.get("LOG_ARCHIVE_SEGMENTS", 64))
 
 # Flask
 MAIN_TITLE: str = "HomeOfficeLight"
@@ -38,6 +47,26 @@ FRONTEND_STATIC_DIR: str = "static/"
 PORT_FRONTEND: int = 9080
 PORT_BACKEND: int = 9000
 PORT_REMOTE: int = 9001
+# WSGI server for backend and frontend: "cheroot" or "flask" (dev server)
+WSGI_SERVER: str = env.get("WSGI_SERVER", "cheroot").lower()
+WSGI_THREADS: int = int(env.get("WSGI_THREADS", 16))
+WSGI_KEEP_ALIVE_CONNECTIONS: int = 32
+WSGI_REQUEST_TIMEOUT: td = td(seconds=10)
+WSGI_SHUTDOWN_TIMEOUT: td = td(seconds=5)
+# Event streams and long-polls occupy one worker each, so only part of the
+# pool may be used by them; further ones are asked to retry later
+WSGI_MAX_LONG_REQUESTS: int = max(1, WSGI_THREADS // 2)
+WSGI_BUSY_RETRY_AFTER: td = td(seconds=5)
+# Maximum time a long-poll request on /state/wait is held open
+STATE_WAIT_TIMEOUT: td = td(seconds=30)
+# Maximum time a request waits for its state command to be carried out
+STATE_COMMAND_TIMEOUT: td = td(seconds=2)
+# Live updates pushed to the frontend via server-sent events
+EVENTS_QUEUE_SIZE: int = 100
+EVENTS_KEEP_ALIVE: td = td(seconds=15)
+
+# Hardware backend: "rpi" for the real hardware, "sim" for simulation
+HARDWARE_BACKEND: str = env.get("HARDWARE_BACKEND", "rpi").lower()
 
 # Bell
 BELL_REQUEST_TIMEOUT: td = td(seconds=30)
@@ -51,6 +80,35 @@ PIN_LEDS: int = 18
 LEDS_TOTAL: int = 13
 LEDS_TOP: List[int] = list(range(0, 6))
 LEDS_BOTTOM: List[int] = list(range(7, 13))
+LEDS_ANIMATION_FPS: int = 50
 
 # Remotes
 REMOTE_EXP_TIMEOUT: td = td(hours=3)
+REMOTE_TX_WORKERS: int = 8
+# Wait this long before sending an update, so rapid successive state changes
+# are merged into one single transmission per remote (0 to send immediately)
+REMOTE_COALESCE_WINDOW: td = td(
+    milliseconds=int(env.get("REMOTE_COALESCE_WINDOW_MS", 0))
+)
+# Failed updates are retried after the minimum delay; after several failures in
+# a row, the circuit breaker opens and the delay doubles with every failed
+# retry (probe) until one succeeds or the remote polls
+REMOTE_RETRY_DELAY_MIN: td = td(seconds=1)
+REMOTE_RETRY_DELAY_MAX: td = td(minutes=5)
+REMOTE_BREAKER_THRESHOLD: int = 3
+# Announce every state change via UDP to a multicast group or broadcast address
+# (disabled if not set); remotes registering with the "announce" flag do not
+# receive TCP updates anymore
+ANNOUNCE_ADDRESS: Optional[str] = env.get("ANNOUNCE_ADDRESS") or None
+ANNOUNCE_PORT: int = int(env.get("ANNOUNCE_PORT", 9002))
+ANNOUNCE_REPEATS: int = int(env.get("ANNOUNCE_REPEATS", 3))
+ANNOUNCE_REPEAT_INTERVAL: td = td(milliseconds=100)
+ANNOUNCE_MULTICAST_TTL: int = 1
+ANNOUNCE_MAX_SIZE: int = 1400
+# Keep connections to remotes open between updates (requires remotes which
+# do not close the connection after each request)
+REMOTE_KEEP_ALIVE: bool = env.get("REMOTE_KEEP_ALIVE", "no").lower() in (
+    "1",
+    "yes",
+    "true",
+)
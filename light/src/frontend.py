@@ -2,29 +2,41 @@
 
 """HomeOfficeLight frontend python module."""
 
+import json
+from concurrent.futures import Future, wait
 from datetime import datetime
 from logging import CRITICAL, DEBUG, ERROR, INFO, WARNING
 from os.path import abspath
-from typing import Dict, List, Optional, Tuple
+from threading import BoundedSemaphore
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from flask_bootstrap import Bootstrap5
 
+from aux.event_bus import Event, Subscription, event_bus
+from aux.wsgi_server import WsgiServer
 from constants import (
+    EVENTS_KEEP_ALIVE,
     HOSTNAME,
     IP_ADDR,
     LOG_MAPPING,
+    LOG_PAGE_SIZE,
+    LOG_QUERY_LIMIT,
     MAIN_TITLE,
     MAIN_TITLE_NAVBAR,
     PORT_BACKEND,
     PORT_REMOTE,
     PY_VERSION,
+    STATE_COMMAND_TIMEOUT,
     SW_VERSION,
+    WSGI_BUSY_RETRY_AFTER,
+    WSGI_MAX_LONG_REQUESTS,
 )
-from logger import MemoryLogBuffer
+from logger import MemoryLogBuffer, get_num_of_dropped_records
 from home_office_light import HomeOfficeLight
 from remote import HomeOfficeLightRemote
+from snapshot import LightSnapshot
 from states import States
 
 # pylint: disable=E1101
@@ -43,6 +55,10 @@ class Frontend:
             static_folder=abspath(static_folder),
         )
         self.app.secret_key = uuid4().hex
+        self._server: Optional[WsgiServer] = None
+        self._stream_slots: BoundedSemaphore = BoundedSemaphore(
+            WSGI_MAX_LONG_REQUESTS
+        )
         self.app.jinja_options["extensions"] = [
             "jinja2_humanize_extension.HumanizeExtension"
         ]
@@ -65,10 +81,20 @@ class Frontend:
         def _route_log():
             return self.log()
 
+        @self.app.route("/log.json", methods=["GET"])
+        def _route_log_json():
+            return self.log_json()
+
+        @self.app.route("/events", methods=["GET"])
+        def _route_events():
+            return self.events()
+
     def generate_navigation(
-        self,
+        self, snapshot: Optional[LightSnapshot] = None
     ) -> Dict[str, Tuple[List[str], Optional[Tuple[str, int]]]]:
         """Generate a dict containing all navigation items and badges."""
+        if snapshot is None:
+            snapshot = self.hol_instance.snapshot
 
         num_warnings: int = MemoryLogBuffer.get_num_of_entries(
             WARNING, only_new=True
@@ -87,28 +113,25 @@ class Frontend:
             "State": (["/state", "/"], None),
             "Remotes": (
                 ["/remotes"],
-                (
-                    "secondary",
-                    len(list(filter(
-                        lambda x: x.is_active(),
-                        self.hol_instance.remotes,
-                    ))),
-                ),
+                ("secondary", snapshot.num_remotes_active),
             ),
             "Log": (["/log"], log_badge),
         }
 
     def state(self) -> str:
         """Renders the state page of the web application."""
+        futures: List["Future[Any]"] = []
         if "set" in request.args:
-            self.hol_instance.set_state(request.args["set"])
+            futures.append(self.hol_instance.set_state(request.args["set"]))
 
         if "button" in request.args:
-            self.hol_instance.on_bell_button()
+            futures.append(self.hol_instance.on_bell_button())
+        wait(futures, STATE_COMMAND_TIMEOUT.total_seconds())
 
+        snapshot: LightSnapshot = self.hol_instance.snapshot
         return render_template(
             "state.html",
-            navigation=self.generate_navigation(),
+            navigation=self.generate_navigation(snapshot),
             title=MAIN_TITLE,
             title_nav=MAIN_TITLE_NAVBAR,
             hostname=HOSTNAME,
@@ -116,39 +139,40 @@ class Frontend:
             sw_version=SW_VERSION,
             py_version=PY_VERSION,
             ip_addr=IP_ADDR,
-            hol_instance=self.hol_instance,
+            snapshot=snapshot,
             port_backend=PORT_BACKEND,
             port_remote=PORT_REMOTE,
-            num_remotes_active=len(list(filter(
-                lambda x: x.is_active(),
-                self.hol_instance.remotes
-            ))),
-            num_remotes_inactive=len(list(filter(
-                lambda x: not x.is_active(),
-                self.hol_instance.remotes
-            ))),
-            state_mapping=(
-                # name, text, icon, disabled
-                ("none", "None", "fa-ban", False),
-                ("call", "Call", "fa-phone", False),
-                ("video", "Video", "fa-camera", False),
-                (
-                    "request",
-                    "Request",
-                    "fa-bell",
-                    self.hol_instance.state != States.VIDEO,
-                ),
-                (
-                    "coffee",
-                    "I need a coffee…",
-                    "fa-coffee",
-                    self.hol_instance.state != States.NONE,
-                ),
+            state_mapping=self.get_state_mapping(snapshot.state_name),
+        )
+
+    @staticmethod
+    def get_state_mapping(
+        state: str,
+    ) -> Tuple[Tuple[str, str, str, bool], ...]:
+        """Generate a tuple containing all states selectable from the given
+        state."""
+        return (
+            # name, text, icon, disabled
+            ("none", "None", "fa-ban", False),
+            ("call", "Call", "fa-phone", False),
+            ("video", "Video", "fa-camera", False),
+            (
+                "request",
+                "Request",
+                "fa-bell",
+                state != States.VIDEO.name.lower(),
+            ),
+            (
+                "coffee",
+                "I need a coffee…",
+                "fa-coffee",
+                state != States.NONE.name.lower(),
             ),
         )
 
     def remotes(self) -> str:
         """Renders the remotes page of the web application."""
+        futures: List["Future[Any]"] = []
         if request.method == "POST":
             remote: Optional[HomeOfficeLightRemote]
             if "add-remote" in request.form:
@@ -156,32 +180,37 @@ class Frontend:
                     request.form["new-remote"]
                 )
                 if remote:
-                    self.hol_instance.add_or_update_remote(remote)
+                    futures.append(
+                        self.hol_instance.add_or_update_remote(remote)
+                    )
 
             elif "act-remote" in request.form:
                 remote = HomeOfficeLightRemote.parse_from_str(
                     request.form["act-remote"]
                 )
                 if remote:
-                    self.hol_instance.activate_remote(remote)
+                    futures.append(self.hol_instance.activate_remote(remote))
 
             elif "deact-remote" in request.form:
                 remote = HomeOfficeLightRemote.parse_from_str(
                     request.form["deact-remote"]
                 )
                 if remote:
-                    self.hol_instance.deactivate_remote(remote)
+                    futures.append(self.hol_instance.deactivate_remote(remote))
 
             elif "del-remote" in request.form:
                 remote = HomeOfficeLightRemote.parse_from_str(
                     request.form["del-remote"]
                 )
                 if remote:
-                    self.hol_instance.delete_remote(remote)
+                    futures.append(self.hol_instance.delete_remote(remote))
+
+        wait(futures, STATE_COMMAND_TIMEOUT.total_seconds())
 
+        snapshot: LightSnapshot = self.hol_instance.snapshot
         return render_template(
             "remotes.html",
-            navigation=self.generate_navigation(),
+            navigation=self.generate_navigation(snapshot),
             title=MAIN_TITLE,
             title_nav=MAIN_TITLE_NAVBAR,
             hostname=HOSTNAME,
@@ -189,9 +218,28 @@ class Frontend:
             sw_version=SW_VERSION,
             client_ip=request.remote_addr,
             port_remote=PORT_REMOTE,
-            remotes=list(enumerate(self.hol_instance.remotes)),
+            remotes=list(enumerate(snapshot.remotes)),
         )
 
+    @staticmethod
+    def get_filter_level(filter_name: Optional[str]) -> int:
+        """Get the log level matching the name of a log filter."""
+        filter_level: int = INFO
+        for level, properties in LOG_MAPPING.items():
+            if properties[0].lower() == (filter_name or "").lower():
+                filter_level = level
+        return filter_level
+
+    @staticmethod
+    def parse_time(value: Optional[str]) -> Optional[float]:
+        """Parse an ISO date and time string into epoch seconds."""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+
     def log(self) -> str:
         """Renders the log page of the web application."""
         filter_name: str = (
@@ -199,10 +247,30 @@ class Frontend:
             if "filter" not in request.args
             else request.args["filter"].lower()
         )
-        filter_level: int = INFO
-        for level, properties in LOG_MAPPING.items():
-            if properties[0].lower() == filter_name.lower():
-                filter_level = level
+        filter_level: int = self.get_filter_level(filter_name)
+        before: Optional[int] = request.args.get("before", type=int)
+        time_from: str = request.args.get("from", "")
+        time_to: str = request.args.get("to", "")
+        start: Optional[float] = self.parse_time(time_from)
+        end: Optional[float] = self.parse_time(time_to)
+
+        seen_number: int = MemoryLogBuffer.seen_number
+        entries: List[MemoryLogBuffer.LogEntry]
+        if start is None and end is None:
+            # Fetch the requested page and mark everything up to it as seen
+            entries = MemoryLogBuffer.get_page(
+                filter_level, LOG_PAGE_SIZE, before
+            )
+            if entries:
+                MemoryLogBuffer.mark_seen(entries[0].number)
+        else:
+            entries = MemoryLogBuffer.query(
+                start or 0,
+                end or float("inf"),
+                filter_level,
+                before,
+                LOG_PAGE_SIZE,
+            )
 
         return render_template(
             "log.html",
@@ -215,8 +283,131 @@ class Frontend:
             log_mapping=LOG_MAPPING,
             log_buffer=MemoryLogBuffer,
             filter_level=filter_level,
+            entries=entries,
+            seen_number=seen_number,
+            before=before,
+            time_from=time_from if start is not None else "",
+            time_to=time_to if end is not None else "",
+            page_size=LOG_PAGE_SIZE,
+            num_dropped=get_num_of_dropped_records(),
+        )
+
+    def log_json(self) -> Response:
+        """Provides log entries of an arbitrary time window as JSON."""
+        limit: int = max(
+            1,
+            min(
+                request.args.get("limit", LOG_PAGE_SIZE, type=int),
+                LOG_QUERY_LIMIT,
+            ),
+        )
+        entries: List[MemoryLogBuffer.LogEntry] = MemoryLogBuffer.query(
+            self.parse_time(request.args.get("from")) or 0,
+            self.parse_time(request.args.get("to")) or float("inf"),
+            self.get_filter_level(request.args.get("level", "debug")),
+            request.args.get("before", type=int),
+            limit,
+        )
+        return jsonify(
+            {
+                "entries": [
+                    {
+                        "number": entry.number,
+                        "time": entry.time.isoformat(),
+                        "logger": entry.logger,
+                        "level": LOG_MAPPING.get(
+                            entry.level, (str(entry.level),)
+                        )[0].lower(),
+                        "path": entry.path,
+                        "line": entry.line,
+                        "message": entry.message,
+                    }
+                    for entry in entries
+                ],
+                "before": entries[-1].number
+                if entries and len(entries) == limit
+                else None,
+            }
+        )
+
+    def events(self) -> Response:
+        """Provides a stream of server-sent events with live updates of the
+        state, the remotes and the log. If too many streams are open already,
+        the client is told to reconnect later instead.
+
+        Log events carry the entry number as event ID, so a reconnecting
+        client is sent the entries it has missed in the meantime."""
+        if not self._stream_slots.acquire(blocking=False):
+            retry_ms: int = int(WSGI_BUSY_RETRY_AFTER.total_seconds() * 1000)
+            return Response(
+                f"retry: {retry_ms}\n\n",
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache"},
+            )
+
+        last_number: Optional[int] = request.headers.get(
+            "Last-Event-ID", type=int
+        )
+
+        def generate() -> Iterator[str]:
+            subscription: Subscription = event_bus.subscribe()
+            replayed: int = 0
+            try:
+                yield "retry: 3000\n\n"
+                if last_number is not None:
+                    for data in MemoryLogBuffer.get_missed_events(
+                        last_number
+                    ):
+                        replayed = data["number"]
+                        yield self.format_event("log", data)
+                while not subscription.closed:
+                    events: List[Event] = subscription.get(
+                        EVENTS_KEEP_ALIVE.total_seconds()
+                    )
+                    if subscription.overflowed:
+                        # Client is too slow, so let it reload the page
+                        yield "event: reload\ndata: {}\n\n"
+                        return
+                    if not events:
+                        yield ": keep-alive\n\n"
+                    for name, data in events:
+                        if name == "log" and data["number"] <= replayed:
+                            continue
+                        if name == "state":
+                            data = dict(data)
+                            data["disabled"] = [
+                                state[0]
+                                for state in self.get_state_mapping(
+                                    data["state"]
+                                )
+                                if state[3]
+                            ]
+                        yield self.format_event(name, data)
+            finally:
+                event_bus.unsubscribe(subscription)
+
+        response: Response = Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
+        response.call_on_close(self._stream_slots.release)
+        return response
+
+    @staticmethod
+    def format_event(name: str, data: Dict[str, Any]) -> str:
+        """Encode a server-sent event; log entries are identified by their
+        number."""
+        event_id: str = f"id: {data['number']}\n" if name == "log" else ""
+        return f"{event_id}event: {name}\ndata: {json.dumps(data)}\n\n"
 
     def run(self, port, host: str = "0.0.0.0") -> None:
-        """Trigger the inner run method of the flask application."""
-        self.app.run(host, port)
+        """Serve the flask application until stopped."""
+        self._server = WsgiServer(self.app, port, host)
+        self._server.run()
+
+    def stop(self) -> None:
+        """Stop serving the flask application gracefully."""
+        event_bus.close()
+        if self._server:
+            self._server.stop()
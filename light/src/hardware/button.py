@@ -2,14 +2,14 @@
 
 """Helper module for handling the HomeOfficeLight bell button."""
 
-from datetime import datetime, timedelta
-from time import sleep
+from datetime import timedelta
+from queue import Empty, Queue
+from threading import Thread
+from time import monotonic
 from typing import Callable, Optional
 
-from RPi import GPIO
-
-from aux.bg_task import BgTask
 from constants import BELL_DEBOUNCE_TIME
+from hardware.interface import GPIO
 
 
 class Button:
@@ -26,9 +26,15 @@ class Button:
         self.threshold: timedelta = threshold
         self._cb_pressed: Optional[Callable[[], None]] = callback_pressed
         self._cb_released: Optional[Callable[[], None]] = callback_released
-        self._gpio_setup()
-        self._debounce_task: BgTask = BgTask(self._run_debounce_task, (False,))
         self.debounced: bool = False
+        self.edge_count: int = 0
+        self.last_latency: Optional[timedelta] = None
+        self._edges: "Queue[Optional[float]]" = Queue()
+        self._debounce_thread: Thread = Thread(
+            target=self._run_debounce_task, daemon=True
+        )
+        self._debounce_thread.start()
+        self._gpio_setup()
 
     def _gpio_setup(self) -> None:
         """Manages the internal GPIO setup."""
@@ -39,7 +45,8 @@ class Button:
 
     def cleanup(self) -> None:
         """Reset any GPIOs used in this module."""
-        self._debounce_task.cancel()
+        self._edges.put(None)
+        self._debounce_thread.join()
         GPIO.cleanup()
 
     def get_button_state(self) -> bool:
@@ -49,20 +56,43 @@ class Button:
     def on_gpio_edge(self, _) -> None:
         """Internal method which must be called upon ANY detected edge of the
         button (i.e. by the bare GPIO functionalities)."""
-        self._debounce_task.restart((self.get_button_state(),))
+        self._edges.put(monotonic())
 
-    def _run_debounce_task(self, state: bool) -> None:
-        """Perform internally debouncing operations."""
-        end: datetime = datetime.now() + self.threshold
-        while datetime.now() < end:
-            if (
-                self._debounce_task.is_canceled()
-                or self.get_button_state() != state
-            ):
+    def _run_debounce_task(self) -> None:
+        """Perform internally debouncing operations. Every queued edge restarts
+        the debounce deadline; once no further edge arrives until then, the
+        button state is considered stable."""
+        threshold: float = self.threshold.total_seconds()
+        first_edge: Optional[float] = None
+        deadline: float = 0
+
+        while True:
+            try:
+                edge: Optional[float] = self._edges.get(
+                    timeout=None
+                    if first_edge is None
+                    else max(0, deadline - monotonic())
+                )
+            except Empty:
+                if first_edge is not None:
+                    self._on_stable(self.get_button_state(), first_edge)
+                first_edge = None
+                continue
+
+            if edge is None:
                 return
-            sleep(0.001)
+            self.edge_count += 1
+            if first_edge is None:
+                first_edge = edge
+            deadline = edge + threshold
+
+    def _on_stable(self, state: bool, first_edge: float) -> None:
+        """Handle a settled button state and run the matching callback."""
+        if state == self.debounced:
+            return
 
         self.debounced = state
+        self.last_latency = timedelta(seconds=monotonic() - first_edge)
         if state and self._cb_pressed:
             self._cb_pressed()
         if not state and self._cb_released:
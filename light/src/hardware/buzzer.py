@@ -4,10 +4,9 @@
 
 from time import sleep
 
-from RPi import GPIO
-
 from aux.bg_task import BgTask
 from constants import BELL_BUZZER_SEQUENCE
+from hardware.interface import GPIO
 
 
 class Buzzer:
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+"""Helper module which selects the hardware backend at startup."""
+
+# pylint: disable=C0103,W0611
+
+from constants import HARDWARE_BACKEND
+
+# The backend modules are only re-exported from here
+if HARDWARE_BACKEND == "sim":
+    from hardware.simulation import GPIO  # type: ignore # noqa: F401
+    from hardware.simulation import (  # noqa: F401
+        SimulatedNeoPixel as NeoPixel,
+    )
+else:
+    from RPi import GPIO  # type: ignore # noqa: F401
+    from rpi_ws281x import (  # type: ignore # noqa: F401
+        Adafruit_NeoPixel as NeoPixel,
+    )
@@ -4,15 +4,18 @@
 
 from datetime import timedelta
 from random import randint
-from time import sleep
-from typing import List, Tuple
-
-from rpi_ws281x import Adafruit_NeoPixel
+from typing import Callable, List, Optional, Tuple
 
 from aux.bg_task import BgTask
+from aux.frame_scheduler import FrameScheduler
 from aux.pulse_wave import PulseWave
+from constants import LEDS_ANIMATION_FPS
+from hardware.interface import NeoPixel
+from logger import get_logger
 from states import States
 
+logger = get_logger(__name__)
+
 # pylint: disable=C0103
 rgb = Tuple[int, int, int]
 
@@ -30,7 +33,7 @@ class LedStrip:
     ):
         self._leds_top: List[int] = leds_top
         self._leds_bottom: List[int] = leds_bottom
-        self._strip = Adafruit_NeoPixel(
+        self._strip = NeoPixel(
             # pylint: disable=C0301
             leds_total,  # Number of LED pixels
             led_pin,  # GPIO pin connected to the pixels (18 uses PWM!)
@@ -44,25 +47,55 @@ class LedStrip:
         )
         self._strip.begin()
         self.state: States = States.NONE
+        self.frames_shown: int = 0
+        self.frames_skipped: int = 0
+        self._pixels: List[rgb] = [(0, 0, 0)] * leds_total
+        self._brightness: int = 255
+        self._shown_pixels: Optional[List[rgb]] = None
+        self._shown_brightness: Optional[int] = None
         self._light_task: BgTask = BgTask(self._run_light_task, (States.NONE,))
         self.clear()
+        self.show()
 
     def cleanup(self) -> None:
         """Reset any GPIOs used in this module."""
         self._light_task.cancel()
         self.clear()
+        self.show()
+
+    def show(self) -> None:
+        """Commit the framebuffer to the LED strip with one single show() call.
+        A frame identical to the last committed one is skipped entirely."""
+        if (
+            self._pixels == self._shown_pixels
+            and self._brightness == self._shown_brightness
+        ):
+            self.frames_skipped += 1
+            return
+
+        for pixel, color in enumerate(self._pixels):
+            if (
+                self._shown_pixels is None
+                or self._shown_pixels[pixel] != color
+            ):
+                self._strip.setPixelColorRGB(pixel, *color)
+        if self._brightness != self._shown_brightness:
+            self._strip.setBrightness(self._brightness)
+        self._strip.show()
+
+        self._shown_pixels = list(self._pixels)
+        self._shown_brightness = self._brightness
+        self.frames_shown += 1
 
     def set_top(self, color: rgb) -> None:
-        """Set the LED color of the top glass field."""
+        """Set the LED color of the top glass field in the framebuffer."""
         for pixel in self._leds_top:
-            self._strip.setPixelColorRGB(pixel, *color)
-        self._strip.show()
+            self._pixels[pixel] = color
 
     def set_bottom(self, color: rgb) -> None:
-        """Set the LED color of the bottom glass field."""
+        """Set the LED color of the bottom glass field in the framebuffer."""
         for pixel in self._leds_bottom:
-            self._strip.setPixelColorRGB(pixel, *color)
-        self._strip.show()
+            self._pixels[pixel] = color
 
     def set_all(self, color: rgb) -> None:
         """Set the LED color of both glass fields."""
@@ -70,12 +103,11 @@ class LedStrip:
         self.set_bottom(color)
 
     def set_brightness(self, brightness: int) -> None:
-        """Set the brightness of all LEDs on the strip."""
-        self._strip.setBrightness(brightness)
-        self._strip.show()
+        """Set the brightness of all LEDs on the strip in the framebuffer."""
+        self._brightness = brightness
 
     def clear(self) -> None:
-        """Turn off any LEDs."""
+        """Turn off any LEDs in the framebuffer."""
         self.set_all((0, 0, 0))
         self.set_brightness(255)
 
@@ -91,30 +123,60 @@ class LedStrip:
         if state == States.CALL:
             yellow: rgb = (255, 150, 0)
             self.set_bottom(yellow)
+            self.show()
 
         elif state == States.VIDEO:
             red: rgb = (255, 0, 0)
             self.set_top(red)
+            self.show()
 
         elif state == States.REQUEST:
             blue: rgb = (0, 200, 255)
             self.set_top(blue)
             wave: PulseWave = PulseWave(timedelta(milliseconds=800), (30, 255))
-            while not self._light_task.is_canceled():
-                self.set_brightness(wave.get_scaled())
-                sleep(0.02)
+            brightness: List[int] = wave.get_frames(LEDS_ANIMATION_FPS)
+
+            def show_request_frame(frame: int) -> None:
+                self.set_brightness(brightness[frame % len(brightness)])
+                self.show()
+
+            self._run_animation(LEDS_ANIMATION_FPS, show_request_frame)
 
         elif state == States.COFFEE:
-            top: bool = False
-            while not self._light_task.is_canceled():
+
+            def show_coffee_frame(frame: int) -> None:
                 color: rgb = LedStrip.get_random_color()
                 self.clear()
-                if top:
+                if frame % 2:
                     self.set_top(color)
                 else:
                     self.set_bottom(color)
-                sleep(0.05)
-                top = not top
+                self.show()
+
+            self._run_animation(20, show_coffee_frame)
+
+        else:
+            self.show()
+
+    def _run_animation(
+        self, fps: int, show_frame: Callable[[int], None]
+    ) -> None:
+        """Internal method which plays an animation frame by frame at a fixed
+        frame rate until the light task is canceled."""
+        scheduler: FrameScheduler = FrameScheduler(fps)
+        frame: int = 0
+        while not self._light_task.is_canceled():
+            show_frame(frame)
+            frame = scheduler.wait()
+
+        logger.debug(
+            "Animation stopped after %d frames at %.1f fps (%d overruns, %d "
+            "frames dropped).",
+            scheduler.frames_shown,
+            scheduler.get_fps(),
+            scheduler.overruns,
+            scheduler.frames_dropped,
+        )
 
     @staticmethod
     def get_random_color() -> rgb:
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""Simulated GPIO and WS281x hardware for running the HomeOfficeLight on any
+Linux machine, e.g. for testing and benchmarking."""
+
+from collections import deque
+from dataclasses import dataclass
+from threading import Condition
+from time import monotonic
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# pylint: disable=C0103,W0613
+
+rgb = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class PinChange:
+    """Dataclass which holds one single change of a GPIO pin level."""
+
+    time: float
+    pin: int
+    value: int
+
+
+@dataclass(frozen=True)
+class Frame:
+    """Dataclass which holds one single frame committed to the LED strip."""
+
+    time: float
+    brightness: int
+    pixels: Tuple[rgb, ...]
+
+
+class SimulatedGPIO:
+    """Drop-in replacement for the RPi.GPIO module, which records all outputs
+    and allows to inject input edges."""
+
+    BCM: int = 11
+    BOARD: int = 10
+    IN: int = 1
+    OUT: int = 0
+    LOW: int = 0
+    HIGH: int = 1
+    RISING: int = 31
+    FALLING: int = 32
+    BOTH: int = 33
+
+    HISTORY_CAPACITY: int = 10000
+
+    def __init__(self) -> None:
+        self.levels: Dict[int, int] = {}
+        self.history: Deque[PinChange] = deque(maxlen=self.HISTORY_CAPACITY)
+        self._callbacks: Dict[int, Tuple[int, Callable[[int], None]]] = {}
+        self._cond: Condition = Condition()
+
+    def setwarnings(self, flag: bool) -> None:
+        """Ignored, only for compatibility."""
+
+    def setmode(self, mode: int) -> None:
+        """Ignored, only for compatibility."""
+
+    def setup(self, pin: int, direction: int, initial: int = LOW) -> None:
+        """Set up a pin with the given initial level."""
+        self.levels.setdefault(pin, initial)
+
+    def cleanup(self) -> None:
+        """Remove all registered edge callbacks."""
+        self._callbacks.clear()
+
+    def input(self, pin: int) -> int:
+        """Read the current level of a pin."""
+        return self.levels.get(pin, self.LOW)
+
+    def output(self, pin: int, value: int) -> None:
+        """Set the level of an output pin and record the change."""
+        with self._cond:
+            self.levels[pin] = int(bool(value))
+            self.history.append(PinChange(monotonic(), pin, int(bool(value))))
+            self._cond.notify_all()
+
+    def add_event_detect(
+        self,
+        pin: int,
+        edge: int,
+        callback: Optional[Callable[[int], None]] = None,
+        bouncetime: int = 0,
+    ) -> None:
+        """Register a callback for edges on an input pin."""
+        if callback:
+            self._callbacks[pin] = (edge, callback)
+
+    def inject_edge(self, pin: int, value: int) -> None:
+        """Simulate a level change on an input pin and run the registered
+        callback, if the edge matches."""
+        old_value: int = self.input(pin)
+        value = int(bool(value))
+        self.levels[pin] = value
+        if pin not in self._callbacks or old_value == value:
+            return
+
+        edge, callback = self._callbacks[pin]
+        if edge == self.BOTH or edge == (
+            self.RISING if value else self.FALLING
+        ):
+            callback(pin)
+
+    def get_history(self, pin: int) -> List[PinChange]:
+        """Fetch all recorded level changes of a pin."""
+        with self._cond:
+            return [change for change in self.history if change.pin == pin]
+
+    def wait_for_output(
+        self, pin: int, value: int, since: float, timeout: float
+    ) -> Optional[PinChange]:
+        """Block until the given level has been set on a pin after the given
+        point in time and return the matching change, or None on timeout."""
+
+        def find() -> Optional[PinChange]:
+            match: Optional[PinChange] = None
+            for change in reversed(self.history):
+                if change.time < since:
+                    break
+                if change.pin == pin and change.value == value:
+                    match = change
+            return match
+
+        with self._cond:
+            self._cond.wait_for(find, timeout)
+            return find()
+
+
+class SimulatedNeoPixel:
+    """Drop-in replacement for rpi_ws281x.Adafruit_NeoPixel, which records
+    every committed frame with a timestamp."""
+
+    FRAMES_CAPACITY: int = 10000
+
+    def __init__(
+        self,
+        num: int,
+        pin: int,
+        freq_hz: int = 800000,
+        dma: int = 10,
+        invert: bool = False,
+        brightness: int = 255,
+        channel: int = 0,
+    ):
+        self.pin: int = pin
+        self.frames: Deque[Frame] = deque(maxlen=self.FRAMES_CAPACITY)
+        self._pixels: List[rgb] = [(0, 0, 0)] * num
+        self._brightness: int = brightness
+        self._cond: Condition = Condition()
+        strips.append(self)
+
+    def begin(self) -> None:
+        """Ignored, only for compatibility."""
+
+    def numPixels(self) -> int:
+        """Get the number of pixels of the strip."""
+        return len(self._pixels)
+
+    def setPixelColorRGB(self, pixel: int, red: int, green: int, blue: int):
+        """Set the color of one pixel without committing it."""
+        self._pixels[pixel] = (red, green, blue)
+
+    def getPixelColorRGB(self, pixel: int) -> rgb:
+        """Get the color of one pixel."""
+        return self._pixels[pixel]
+
+    def setBrightness(self, brightness: int) -> None:
+        """Set the brightness of the strip without committing it."""
+        self._brightness = brightness
+
+    def getBrightness(self) -> int:
+        """Get the brightness of the strip."""
+        return self._brightness
+
+    def show(self) -> None:
+        """Commit and record the current frame."""
+        with self._cond:
+            self.frames.append(
+                Frame(monotonic(), self._brightness, tuple(self._pixels))
+            )
+            self._cond.notify_all()
+
+    def wait_for_frame(
+        self, condition: Callable[[Frame], bool], since: float, timeout: float
+    ) -> Optional[Frame]:
+        """Block until a frame matching the condition has been committed after
+        the given point in time and return it, or None on timeout."""
+
+        def find() -> Optional[Frame]:
+            match: Optional[Frame] = None
+            for frame in reversed(self.frames):
+                if frame.time < since:
+                    break
+                if condition(frame):
+                    match = frame
+            return match
+
+        with self._cond:
+            self._cond.wait_for(find, timeout)
+            return find()
+
+
+# Shared instances to be used instead of the real hardware modules
+GPIO: SimulatedGPIO = SimulatedGPIO()
+strips: List[SimulatedNeoPixel] = []
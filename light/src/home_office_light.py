@@ -2,14 +2,24 @@
 
 """Python module which handles the main HomeOfficeLight interfaces and functions."""
 
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from threading import Condition, Lock
 from types import FrameType
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 from transitions import Machine, MachineError
 
+from announcer import Announcer
+from aux.dispatcher import Dispatcher
+from aux.event_bus import event_bus
+from aux.scheduler import ScheduledTask, scheduler
 from aux.timeout import Timeout
+from broadcast import Broadcast
 from constants import (
+    ANNOUNCE_ADDRESS,
+    ANNOUNCE_PORT,
     BELL_REQUEST_TIMEOUT,
     LEDS_BOTTOM,
     LEDS_TOP,
@@ -17,19 +27,29 @@ from constants import (
     PIN_BUTTON,
     PIN_BUZZER,
     PIN_LEDS,
+    REMOTE_COALESCE_WINDOW,
+    REMOTE_TX_WORKERS,
 )
 from hardware.button import Button
 from hardware.buzzer import Buzzer
 from hardware.led import LedStrip
 from logger import get_logger
 from remote import HomeOfficeLightRemote
+from snapshot import LightSnapshot, RemoteViews
 from states import States
 
 logger = get_logger(__name__)
 
 
 class HomeOfficeLight:
-    """Business logic class and state machine for our HomeOfficeLight."""
+    """Business logic class and state machine for our HomeOfficeLight.
+
+    All transitions and changes of the remote registry are serialized through
+    one single dispatcher thread. The public methods causing them only
+    enqueue a command and return a future, which may be waited for.
+
+    After every change, an immutable snapshot is published, which readers on
+    any other thread should use instead of the mutable attributes."""
 
     # pylint: disable=E1101
 
@@ -77,7 +97,16 @@ class HomeOfficeLight:
 
         self.start_time: datetime = datetime.now()
         self.total_state_changes: int = 0
-        self.remotes: List[HomeOfficeLightRemote] = []
+        self._remotes: Dict[Tuple[str, int], HomeOfficeLightRemote] = {}
+        self._views: RemoteViews = RemoteViews()
+        self.snapshot: LightSnapshot = LightSnapshot.create(
+            self.state, 0, self.start_time, 0, self._views
+        )
+        self._snapshot_cond: Condition = Condition()
+        self._expiry_task: Optional[ScheduledTask] = None
+        self._refresh_lock: Lock = Lock()
+        self._refresh_pending: bool = False
+        self._refresh_remotes: Set[Tuple[str, int]] = set()
 
         self._buzzer: Buzzer = Buzzer(PIN_BUZZER)
         self._button: Button = Button(
@@ -87,6 +116,15 @@ class HomeOfficeLight:
             PIN_LEDS, LEDS_TOTAL, LEDS_TOP, LEDS_BOTTOM
         )
         self._bell_timeout: Optional[Timeout] = None
+        self._dispatcher: Dispatcher = Dispatcher("state-dispatcher")
+        self._tx_pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=REMOTE_TX_WORKERS, thread_name_prefix="remote-tx"
+        )
+        self._announcer: Optional[Announcer] = (
+            Announcer(ANNOUNCE_ADDRESS, ANNOUNCE_PORT)
+            if ANNOUNCE_ADDRESS
+            else None
+        )
 
         logger.debug("HomeOfficeLight instance initialized.")
 
@@ -96,77 +134,303 @@ class HomeOfficeLight:
         """Call GPIO cleanup routines."""
         logger.info("Running cleanup routine.")
 
+        self._dispatcher.stop()
         self._button.cleanup()
         self._buzzer.cleanup()
         self._leds.cleanup()
+        self._tx_pool.shutdown(wait=True)
+        for remote in self.remotes:
+            remote.close()
+        scheduler.stop()
+        if self._announcer:
+            self._announcer.close()
+        event_bus.close()
 
     def get_state(self) -> str:
         """Get the current state as a lowercase string."""
         return str(self.state.name).lower()
 
-    def set_state(self, target: str) -> bool:
+    def _publish_snapshot(
+        self,
+        new_version: bool = False,
+        remote: Optional[HomeOfficeLightRemote] = None,
+    ) -> None:
+        """Replace the published snapshot by a new one, rebuilding the view of
+        the given remote only. The state version is incremented on every
+        transition and whenever a remote is added or removed, which wakes up
+        all long-poll requests."""
+        now: datetime = datetime.now()
+        if remote is not None:
+            self._views.update(remote, now)
+        self._views.expire(now)
+        with self._snapshot_cond:
+            self.snapshot = LightSnapshot.create(
+                self.state,
+                self.snapshot.version + int(new_version),
+                self.start_time,
+                self.total_state_changes,
+                self._views,
+            )
+            if new_version:
+                self._snapshot_cond.notify_all()
+
+        # Publish again as soon as the next remote expires
+        if self._expiry_task:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+        next_expiry: Optional[datetime] = self._views.next_expiry
+        if next_expiry:
+            self._expiry_task = scheduler.schedule(
+                self._request_refresh,
+                next_expiry - now + timedelta(milliseconds=1),
+            )
+
+    def _request_refresh(
+        self, remote: Optional[HomeOfficeLightRemote] = None
+    ) -> None:
+        """Request a new snapshot, e.g. after a remote has been updated in the
+        background. Multiple requests are coalesced."""
+        with self._refresh_lock:
+            if remote is not None:
+                self._refresh_remotes.add(remote.key)
+            if self._refresh_pending:
+                return
+            self._refresh_pending = True
+        self._dispatcher.submit(self._refresh)
+
+    def _refresh(self) -> None:
+        """Publish a new snapshot on the dispatcher thread, rebuilding the
+        views of the remotes requested for."""
+        with self._refresh_lock:
+            self._refresh_pending = False
+            keys: Set[Tuple[str, int]] = self._refresh_remotes
+            self._refresh_remotes = set()
+        now: datetime = datetime.now()
+        for key in keys:
+            remote: Optional[HomeOfficeLightRemote] = self._remotes.get(key)
+            if remote is not None:
+                self._views.update(remote, now)
+        self._publish_snapshot()
+        self.publish_remotes()
+
+    def wait_for_state_change(
+        self, version: int, timeout: float
+    ) -> LightSnapshot:
+        """Block until the state version differs from the given one or the
+        timeout (in seconds) has elapsed. Returns the current snapshot."""
+        with self._snapshot_cond:
+            self._snapshot_cond.wait_for(
+                lambda: self.snapshot.version != version, timeout
+            )
+            return self.snapshot
+
+    def set_state(self, target: str) -> "Future[bool]":
         """Try to apply a new state."""
+        return self._dispatcher.submit(self._set_state, target)
+
+    def _set_state(self, target: str) -> bool:
+        """Try to apply a new state on the dispatcher thread."""
         try:
             self.trigger(target.lower())
-        except MachineError:
+        except (AttributeError, MachineError):
             return False
         return True
 
+    @property
+    def remotes(self) -> List[HomeOfficeLightRemote]:
+        """Ordered view of all registered remotes (by registration time)."""
+        return list(self._remotes.values())
+
     def on_remote_request(
         self, remote: HomeOfficeLightRemote, incr_tx: bool = False
-    ) -> None:
+    ) -> "Future[None]":
         """Perform actions when an incoming remote request is recognized."""
-        self.add_or_update_remote(remote)
-        if remote in self.remotes:
-            index: int = self.remotes.index(remote)
-            self.remotes[index].skip_once = True
-            self.remotes[index].rx_count += 1
+        return self._dispatcher.submit(
+            self._on_remote_request, remote, incr_tx
+        )
+
+    def _on_remote_request(
+        self, remote: HomeOfficeLightRemote, incr_tx: bool
+    ) -> None:
+        """Handle an incoming remote request on the dispatcher thread."""
+        new_remote: bool = self._add_or_update_remote(remote)
+        act_remote: Optional[HomeOfficeLightRemote] = self.get_remote(remote)
+        if act_remote:
+            # Listening to announcements sticks until the remote is removed
+            if remote.announce:
+                act_remote.announce = True
+            act_remote.reset_health()
+            act_remote.skip_once = True
+            act_remote.rx_count += 1
             if incr_tx:
-                self.remotes[index].tx_count += 1
+                act_remote.tx_count += 1
+        self._publish_snapshot(new_remote, act_remote)
+        self.publish_remotes()
 
     def get_remote(self, remote: HomeOfficeLightRemote) -> Optional[HomeOfficeLightRemote]:
         """Fetch the actual remote object by passing a reference object with
         matching IP and port."""
-        return next(filter(lambda x: x == remote, self.remotes), None)
+        return self._remotes.get(remote.key)
 
-    def add_or_update_remote(self, remote: HomeOfficeLightRemote) -> None:
+    def add_or_update_remote(
+        self, remote: HomeOfficeLightRemote
+    ) -> "Future[None]":
         """Add a new remote or update an existing one."""
+        return self._dispatcher.submit(self._add_or_update_and_publish, remote)
+
+    def _add_or_update_and_publish(
+        self, remote: HomeOfficeLightRemote
+    ) -> None:
+        """Add or update a remote and publish the change."""
+        self._publish_snapshot(
+            self._add_or_update_remote(remote), self.get_remote(remote)
+        )
+        self.publish_remotes()
+
+    def _add_or_update_remote(self, remote: HomeOfficeLightRemote) -> bool:
+        """Add or update a remote without publishing the change. Returns True
+        if the remote has been added."""
         act_remote: Optional[HomeOfficeLightRemote] = self.get_remote(remote)
         if act_remote:
             act_remote.set_timestamp(datetime.now())
+            return False
 
-        else:
-            remote.set_timestamp(datetime.now())
-            self.remotes.append(remote)
-            logger.info("%s registered.", remote)
+        remote.set_timestamp(datetime.now())
+        self._remotes[remote.key] = remote
+        logger.info("%s registered.", remote)
+        return True
 
-    def delete_remote(self, remote: HomeOfficeLightRemote) -> None:
+    def delete_remote(self, remote: HomeOfficeLightRemote) -> "Future[None]":
         """Remove an existing remote from the registration list."""
-        if remote in self.remotes:
-            self.remotes.remove(remote)
+        return self._dispatcher.submit(self._delete_remote, remote)
+
+    def _delete_remote(self, remote: HomeOfficeLightRemote) -> None:
+        """Remove a remote on the dispatcher thread."""
+        removed: Optional[HomeOfficeLightRemote] = self._remotes.pop(
+            remote.key, None
+        )
+        if removed is not None:
+            removed.discard_updates()
+            self._tx_pool.submit(removed.close)
             logger.info("%s removed.", remote)
+            self._views.remove(remote.key)
+            self._publish_snapshot(True)
+            self.publish_remotes()
 
-    def activate_remote(self, remote: HomeOfficeLightRemote) -> None:
+    def activate_remote(
+        self, remote: HomeOfficeLightRemote
+    ) -> "Future[None]":
         """Activate an existing remote from the registration list."""
+        return self._dispatcher.submit(self._activate_remote, remote)
+
+    def _activate_remote(self, remote: HomeOfficeLightRemote) -> None:
+        """Activate a remote on the dispatcher thread."""
         act_remote: Optional[HomeOfficeLightRemote] = self.get_remote(remote)
         if act_remote:
             act_remote.set_timestamp(datetime.now())
             logger.info("%s activated.", remote)
+            self._publish_snapshot(remote=act_remote)
+            self.publish_remotes()
 
-    def deactivate_remote(self, remote: HomeOfficeLightRemote) -> None:
+    def deactivate_remote(
+        self, remote: HomeOfficeLightRemote
+    ) -> "Future[None]":
         """Deactivate an existing remote from the registration list."""
+        return self._dispatcher.submit(self._deactivate_remote, remote)
+
+    def _deactivate_remote(self, remote: HomeOfficeLightRemote) -> None:
+        """Deactivate a remote on the dispatcher thread."""
         act_remote: Optional[HomeOfficeLightRemote] = self.get_remote(remote)
         if act_remote:
             act_remote.set_timestamp(None)
             logger.info("%s deactivated.", remote)
+            self._publish_snapshot(remote=act_remote)
+            self.publish_remotes()
+
+    def publish_remotes(self) -> None:
+        """Publish a summary of all registered remotes as live update."""
+        if not event_bus.has_subscribers():
+            return
+        snapshot: LightSnapshot = self.snapshot
+        event_bus.publish(
+            "remotes",
+            {
+                "active": snapshot.num_remotes_active,
+                "inactive": snapshot.num_remotes_inactive,
+                "rx_count": snapshot.rx_count,
+                "tx_count": snapshot.tx_count,
+                "tx_errors": snapshot.tx_errors,
+            },
+        )
+
+    def publish_state(self) -> None:
+        """Publish the current state as live update."""
+        if not event_bus.has_subscribers():
+            return
+        snapshot: LightSnapshot = self.snapshot
+        event_bus.publish(
+            "state",
+            {
+                "state": snapshot.state_name,
+                "total_state_changes": snapshot.total_state_changes,
+            },
+        )
 
     def send_update_to_remotes(self) -> None:
-        """Send the current state to all active remotes."""
+        """Send the current state to all active remotes concurrently. Returns
+        immediately; the updates are carried out by the worker pool, which
+        requests a new snapshot once done.
+
+        Every remote only keeps the latest update in its outbox, so states
+        superseded before being sent are never transmitted at all. The update
+        is encoded only once and shared by all remotes."""
+        snapshot: LightSnapshot = self.snapshot
+        update: Broadcast = Broadcast.create(
+            snapshot.state_name,
+            snapshot.version,
+            (remote.ip_addr for remote in snapshot.remotes),
+        )
+        if self._announcer:
+            self._announcer.announce(update)
         for remote in self.remotes:
-            remote.send_update(self.get_state(), self.remotes)
+            # Remotes listening to announcements do not need a TCP update
+            if self._announcer and remote.announce:
+                continue
+            if not remote.queue_update(update):
+                continue
+            if REMOTE_COALESCE_WINDOW:
+                scheduler.schedule(
+                    partial(self._flush_remote, remote),
+                    REMOTE_COALESCE_WINDOW,
+                )
+            else:
+                self._flush_remote(remote)
+
+    def _flush_remote(self, remote: HomeOfficeLightRemote) -> None:
+        """Let the worker pool send all pending updates of a remote."""
+        self._tx_pool.submit(
+            remote.flush_updates,
+            lambda delay, retry_id: scheduler.schedule(
+                lambda: self._retry_remote(remote, retry_id), delay
+            ),
+        ).add_done_callback(lambda _: self._request_refresh(remote))
 
-    def on_bell_button(self) -> None:
+    def _retry_remote(
+        self, remote: HomeOfficeLightRemote, retry_id: int
+    ) -> None:
+        """Retry sending the pending update of a remote, unless the retry has
+        become obsolete in the meantime, e.g. if the remote has been removed."""
+        if self._remotes.get(remote.key) is not remote:
+            return
+        if remote.claim_retry(retry_id):
+            self._flush_remote(remote)
+
+    def on_bell_button(self) -> "Future[None]":
         """Trigger correct action when someone pushed the button."""
+        return self._dispatcher.submit(self._on_bell_button)
+
+    def _on_bell_button(self) -> None:
+        """Handle the bell button on the dispatcher thread."""
         logger.info("Bell button triggered.")
 
         if self.state == States.VIDEO:
@@ -179,6 +443,7 @@ class HomeOfficeLight:
         machine."""
         logger.info("HomeOfficeLight state changed to %s.", self.get_state().upper())
         self.total_state_changes += 1
+        self._publish_snapshot(True)
 
         # Control LED strip
         self._leds.on_state_changed(self.state)
@@ -187,12 +452,22 @@ class HomeOfficeLight:
         if self._bell_timeout and self.state != States.REQUEST:
             self._bell_timeout.cancel()
 
-        # Update remotes
+        # Update remotes and frontend
         self.send_update_to_remotes()
+        self.publish_state()
 
     def on_enter_REQUEST(self) -> None:
         """Auto-called function triggered when entering the request state."""
         # pylint: disable=C0103
         self._buzzer.ring()
-        self._bell_timeout = Timeout(self.video, BELL_REQUEST_TIMEOUT)
+        self._bell_timeout = Timeout(
+            lambda: self._dispatcher.submit(self._on_bell_timeout),
+            BELL_REQUEST_TIMEOUT,
+        )
         self._bell_timeout.start()
+
+    def _on_bell_timeout(self) -> None:
+        """Fall back to the video state if a request has not been answered in
+        time."""
+        if self.state == States.REQUEST:
+            self.video()
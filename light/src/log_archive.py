@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+
+"""Python module which persists log entries in an indexed on-disk archive.
+
+The archive is an append-only sequence of segment files, each holding log
+entries as fixed-size binary records. Logger names and paths are stored once in
+a string table and referenced by ID. For every block of records, a sparse index
+file holds the covered time range and a bit mask of the contained log levels,
+so range queries only need to decode the matching blocks of the memory-mapped
+segments.
+"""
+
+from dataclasses import astuple, dataclass
+from glob import glob
+from mmap import ACCESS_READ, mmap
+from os import makedirs, remove
+from os.path import basename, exists, getsize, join
+from struct import Struct
+from threading import Lock
+from typing import BinaryIO, Dict, List, Optional, TextIO, Tuple
+
+# number, created, level, logger ID, path ID, line, message length, message
+RECORD: Struct = Struct("<QdBHHIH229s")
+# first record in segment, min. created, max. created, level mask
+INDEX: Struct = Struct("<IddB")
+
+# number, created, logger, level, path, line, message
+ArchivedEntry = Tuple[int, float, str, int, str, int, str]
+
+
+def get_level_bit(level: int) -> int:
+    """Map a log level to the bit representing it in the level mask."""
+    return 1 << min(7, max(0, level // 10))
+
+
+def get_level_mask(min_level: int) -> int:
+    """Get a level mask matching all levels above the given level."""
+    return 0xFF & ~(get_level_bit(min_level) - 1)
+
+
+@dataclass
+class Block:
+    """Dataclass which holds the sparse index of one block of records."""
+
+    first: int
+    min_created: float
+    max_created: float
+    level_mask: int
+
+    def add(self, created: float, level: int) -> None:
+        """Extend the block by a record."""
+        self.min_created = min(self.min_created, created)
+        self.max_created = max(self.max_created, created)
+        self.level_mask |= get_level_bit(level)
+
+    def matches(self, start: float, end: float, level_mask: int) -> bool:
+        """Check if the block may contain records of the given time window and
+        levels."""
+        return (
+            self.max_created >= start
+            and self.min_created <= end
+            and bool(self.level_mask & level_mask)
+        )
+
+
+class Segment:
+    """Helper class for one single segment file and its index."""
+
+    def __init__(self, path: str, block_size: int) -> None:
+        self.path: str = path
+        self.index_path: str = path[: -len(".log")] + ".idx"
+        self.block_size: int = block_size
+        self.blocks: List[Block] = []
+        self.num_records: int = 0
+        self._file: Optional[BinaryIO] = None
+        self._index_file: Optional[BinaryIO] = None
+        self._load()
+
+    def _load(self) -> None:
+        """Load the index of an existing segment and restore missing parts of
+        it from the records, e.g. after a crash."""
+        if not exists(self.path):
+            return
+        self.num_records = getsize(self.path) // RECORD.size
+
+        num_indexed: int = 0
+        if exists(self.index_path):
+            with open(self.index_path, "rb") as file:
+                data: bytes = file.read()
+            num_indexed = min(
+                len(data) // INDEX.size, self.num_records // self.block_size
+            )
+            for i in range(num_indexed):
+                self.blocks.append(
+                    Block(*INDEX.unpack_from(data, i * INDEX.size))
+                )
+
+        # Drop any incomplete record at the end of the segment
+        with open(self.path, "r+b") as file:
+            file.truncate(self.num_records * RECORD.size)
+        if self.num_records == 0:
+            return
+
+        with open(self.path, "rb") as file:
+            with mmap(file.fileno(), 0, access=ACCESS_READ) as records:
+                first: int = num_indexed * self.block_size
+                for i in range(first, self.num_records):
+                    fields = RECORD.unpack_from(records, i * RECORD.size)
+                    self._add_to_index(i, fields[1], fields[2])
+
+        # Rewrite index file for consistency with the records
+        with open(self.index_path, "wb") as file:
+            for block in self._get_full_blocks():
+                file.write(INDEX.pack(*astuple(block)))
+
+    def _get_full_blocks(self) -> List[Block]:
+        """Get all blocks which are completely filled with records."""
+        return self.blocks[: self.num_records // self.block_size]
+
+    def _add_to_index(self, record: int, created: float, level: int) -> None:
+        """Add a record to the in-memory index."""
+        if record % self.block_size == 0:
+            self.blocks.append(Block(record, created, created, 0))
+        self.blocks[-1].add(created, level)
+
+    def append(self, data: bytes, created: float, level: int) -> None:
+        """Append an encoded record and update the index."""
+        # pylint: disable=R1732
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            self._index_file = open(self.index_path, "ab")
+        self._file.write(data)
+        self._file.flush()
+        self._add_to_index(self.num_records, created, level)
+        self.num_records += 1
+
+        if self.num_records % self.block_size == 0 and self._index_file:
+            self._index_file.write(INDEX.pack(*astuple(self.blocks[-1])))
+            self._index_file.flush()
+
+    def close(self) -> None:
+        """Close all open files of this segment."""
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._index_file:
+            self._index_file.close()
+            self._index_file = None
+
+    def get_time_range(self) -> Tuple[float, float]:
+        """Get the time range covered by this segment."""
+        if not self.blocks:
+            return (0, 0)
+        return (
+            min(block.min_created for block in self.blocks),
+            max(block.max_created for block in self.blocks),
+        )
+
+    def query(
+        self,
+        start: float,
+        end: float,
+        min_level: int,
+        before: Optional[int],
+        limit: int,
+        num_records: int,
+    ) -> List[Tuple]:
+        """Fetch matching raw records of this segment, newest first. Only the
+        given number of records is considered, so records appended during the
+        query are left out."""
+        result: List[Tuple] = []
+        level_mask: int = get_level_mask(min_level)
+        if num_records == 0:
+            return result
+
+        with open(self.path, "rb") as file, mmap(
+            file.fileno(), num_records * RECORD.size, access=ACCESS_READ
+        ) as records:
+            for block in reversed(list(self.blocks)):
+                if block.first >= num_records or not block.matches(
+                    start, end, level_mask
+                ):
+                    continue
+                last: int = min(block.first + self.block_size, num_records)
+                for i in range(last - 1, block.first - 1, -1):
+                    fields = RECORD.unpack_from(records, i * RECORD.size)
+                    if (
+                        start <= fields[1] <= end
+                        and fields[2] >= min_level
+                        and (before is None or fields[0] < before)
+                    ):
+                        result.append(fields)
+                        if len(result) >= limit:
+                            return result
+        return result
+
+
+class LogArchive:
+    """Append-only, indexed on-disk archive of log entries."""
+
+    STRINGS_FILE: str = "strings.txt"
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 16384,
+        block_size: int = 256,
+        max_segments: int = 64,
+    ) -> None:
+        self.directory: str = directory
+        self.segment_size: int = segment_size
+        self.block_size: int = block_size
+        self.max_segments: int = max_segments
+        self.last_number: int = 0
+        self._lock: Lock = Lock()
+        self._strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self._strings_file: Optional[TextIO] = None
+
+        makedirs(directory, exist_ok=True)
+        self._load_strings()
+        self._segments: List[Segment] = [
+            Segment(path, block_size)
+            for path in sorted(glob(join(directory, "segment-*.log")))
+        ]
+        if self._segments and self._segments[-1].num_records:
+            last: Segment = self._segments[-1]
+            with open(last.path, "rb") as file:
+                file.seek((last.num_records - 1) * RECORD.size)
+                self.last_number = RECORD.unpack(file.read(RECORD.size))[0]
+
+    def _load_strings(self) -> None:
+        """Load the string table."""
+        path: str = join(self.directory, self.STRINGS_FILE)
+        if exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    self._string_ids[line[:-1]] = len(self._strings)
+                    self._strings.append(line[:-1])
+        # pylint: disable=R1732
+        self._strings_file = open(path, "a", encoding="utf-8")
+
+    def _get_string_id(self, string: str) -> int:
+        """Fetch the ID of a string and add it to the string table if new."""
+        string = string.replace("\n", " ")
+        if string not in self._string_ids and self._strings_file:
+            self._string_ids[string] = len(self._strings)
+            self._strings.append(string)
+            self._strings_file.write(string + "\n")
+            self._strings_file.flush()
+        return self._string_ids[string]
+
+    def append(
+        self,
+        number: int,
+        created: float,
+        logger: str,
+        level: int,
+        path: str,
+        line: int,
+        message: str,
+    ) -> None:
+        """Append a log entry to the archive."""
+        encoded: bytes = message.encode("utf-8")[:229]
+        with self._lock:
+            data: bytes = RECORD.pack(
+                number,
+                created,
+                min(255, level),
+                self._get_string_id(logger),
+                self._get_string_id(path),
+                line,
+                len(encoded),
+                encoded,
+            )
+            if (
+                not self._segments
+                or self._segments[-1].num_records >= self.segment_size
+            ):
+                self._add_segment(number)
+            self._segments[-1].append(data, created, level)
+            self.last_number = number
+
+    def _add_segment(self, first_number: int) -> None:
+        """Start a new segment and drop the oldest ones if necessary."""
+        if self._segments:
+            self._segments[-1].close()
+        self._segments.append(
+            Segment(
+                join(self.directory, f"segment-{first_number:012d}.log"),
+                self.block_size,
+            )
+        )
+        while len(self._segments) > self.max_segments:
+            segment: Segment = self._segments.pop(0)
+            for path in (segment.path, segment.index_path):
+                if exists(path):
+                    remove(path)
+
+    def query(
+        self,
+        start: float = 0,
+        end: float = float("inf"),
+        min_level: int = 0,
+        before: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ArchivedEntry]:
+        """Fetch entries of the given time window (epoch seconds) with a given
+        minimum level, newest first. If set, only entries older than the given
+        entry number are returned."""
+        # The record counts must be taken together with the string table, so
+        # all strings referenced by the queried records are known
+        with self._lock:
+            segments: List[Tuple[Segment, int]] = [
+                (segment, segment.num_records) for segment in self._segments
+            ]
+            strings: List[str] = list(self._strings)
+
+        result: List[ArchivedEntry] = []
+        for segment, num_records in reversed(segments):
+            seg_start, seg_end = segment.get_time_range()
+            if seg_end < start or seg_start > end:
+                continue
+            try:
+                matches: List[Tuple] = segment.query(
+                    start,
+                    end,
+                    min_level,
+                    before,
+                    limit - len(result),
+                    num_records,
+                )
+            except FileNotFoundError:
+                # The segment has been dropped by a rotation in the meantime
+                continue
+            for fields in matches:
+                result.append(
+                    (
+                        fields[0],
+                        fields[1],
+                        strings[fields[3]],
+                        fields[2],
+                        strings[fields[4]],
+                        fields[5],
+                        fields[7][: fields[6]].decode("utf-8", "ignore"),
+                    )
+                )
+            if len(result) >= limit:
+                break
+        return result
+
+    def get_segments(self) -> List[str]:
+        """Get the file names of all segments."""
+        with self._lock:
+            return [basename(segment.path) for segment in self._segments]
+
+    def close(self) -> None:
+        """Close all open files."""
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            if self._strings_file:
+                self._strings_file.close()
+                self._strings_file = None
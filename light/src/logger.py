@@ -2,39 +2,104 @@
 
 """Helper module for simple logger configuration."""
 
+import atexit
 import logging
-from copy import deepcopy
-from dataclasses import dataclass
+from bisect import bisect_left
+from collections import deque
 from datetime import datetime
-from logging import DEBUG, Formatter, Logger, LogRecord, StreamHandler
-from logging.handlers import BufferingHandler
-from sys import stdout
-from typing import List, Optional
+from heapq import merge
+from itertools import islice
+from logging import (
+    CRITICAL,
+    DEBUG,
+    ERROR,
+    WARNING,
+    Formatter,
+    Logger,
+    LogRecord,
+    StreamHandler,
+)
+from logging.handlers import BufferingHandler, QueueHandler, QueueListener
+from operator import attrgetter
+from queue import Full, Queue
+from sys import intern, stdout
+from threading import Lock
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
-from constants import LOG_BUFFER_CAPACITY, LOG_LEVEL
+from aux.event_bus import event_bus
+from constants import (
+    LOG_ARCHIVE_DIR,
+    LOG_ARCHIVE_SEGMENTS,
+    LOG_BUFFER_CAPACITY,
+    LOG_LEVEL,
+    LOG_PAGE_SIZE,
+    LOG_QUEUE_POLICY,
+    LOG_QUEUE_SIZE,
+    LOG_QUEUE_TIMEOUT,
+)
+from log_archive import LogArchive
 
 
 class MemoryLogBuffer(BufferingHandler):
     """Simple wrapper around logging.handlers.BufferingHandler, which allows us
     to grab log messages at runtime and e.g. show them on the frontend."""
 
-    @dataclass
-    class LogEntry:
-        """Dataclass which holds one single log entry."""
+    class LogEntry(NamedTuple):
+        """Compact, immutable tuple which holds one single log entry. Logger
+        names and paths are interned; the message is only formatted when it is
+        accessed. Thus, only primitive arguments are kept, since other objects
+        might be large or change until then."""
 
         number: int
-        time: datetime
+        created: float
         logger: str
         level: int
         path: str
         line: int
-        message: str
-        is_new: bool = True
+        msg: str
+        args: Tuple[Any, ...]
 
-    # Static list to hold messages from all loggers
+        @property
+        def time(self) -> datetime:
+            """Get the time this entry was created."""
+            return datetime.fromtimestamp(self.created)
+
+        @property
+        def message(self) -> str:
+            """Get the formatted log message."""
+            try:
+                if self.args:
+                    return str(self.msg % self.args)
+                return self.msg
+            except (TypeError, ValueError):
+                return f"{self.msg} {self.args}"
+
+    # Static ring buffer to hold messages from all loggers; the entry number
+    # serves as a monotonically increasing sequence cursor
     capacity: int = LOG_BUFFER_CAPACITY
     entry_count: int = 0
-    entries: List[LogEntry] = []
+    entries: Deque[LogEntry] = deque(maxlen=capacity)
+    _lock: Lock = Lock()
+
+    # All entries are seen up to this entry number (high-water mark)
+    seen_number: int = 0
+
+    # Entries and number of unseen entries per level, kept up to date on every
+    # change of the buffer
+    _level_entries: Dict[int, Deque[LogEntry]] = {}
+    _unseen_counts: Dict[int, int] = {}
+
+    # Optional on-disk archive all entries are written through to
+    archive: Optional[LogArchive] = None
 
     def __init__(self) -> None:
         BufferingHandler.__init__(self, self.capacity)
@@ -51,37 +116,214 @@ class MemoryLogBuffer(BufferingHandler):
         """Override shouldFlush method of BufferingHandler."""
         return True
 
+    @staticmethod
+    def freeze_message(record: LogRecord) -> Tuple[str, Tuple[Any, ...]]:
+        """Get message and arguments of a record to be stored in an entry.
+        Unless all arguments are immutable primitives, the message is
+        formatted right away instead of keeping references to them."""
+        args: Any = record.args
+        if not args:
+            return str(record.msg), ()
+        if isinstance(args, tuple) and all(
+            type(arg) in (str, int, float, bool) for arg in args
+        ):
+            return str(record.msg), args
+        try:
+            return record.getMessage(), ()
+        except (TypeError, ValueError):
+            return f"{record.msg} {args}", ()
+
     @staticmethod
     def add_entry(record: LogRecord) -> None:
-        """Add a log entry to the static buffer and increment the counter."""
-        MemoryLogBuffer.entry_count += 1
-        MemoryLogBuffer.entries.append(
-            MemoryLogBuffer.LogEntry(
+        """Add a log entry to the static buffer and increment the counter. Once
+        the buffer is full, the oldest entry is dropped."""
+        msg, args = MemoryLogBuffer.freeze_message(record)
+        with MemoryLogBuffer._lock:
+            if len(MemoryLogBuffer.entries) == MemoryLogBuffer.entries.maxlen:
+                evicted: MemoryLogBuffer.LogEntry = MemoryLogBuffer.entries[0]
+                MemoryLogBuffer._level_entries[evicted.level].popleft()
+                if evicted.number > MemoryLogBuffer.seen_number:
+                    MemoryLogBuffer._unseen_counts[evicted.level] -= 1
+
+            MemoryLogBuffer.entry_count += 1
+            entry: MemoryLogBuffer.LogEntry = MemoryLogBuffer.LogEntry(
                 MemoryLogBuffer.entry_count,
-                datetime.fromtimestamp(record.created),
-                record.name,
+                record.created,
+                intern(record.name),
                 record.levelno,
-                record.pathname,
+                intern(record.pathname),
                 record.lineno,
-                record.message,
+                msg,
+                args,
+            )
+            MemoryLogBuffer.entries.append(entry)
+            MemoryLogBuffer._level_entries.setdefault(
+                entry.level, deque()
+            ).append(entry)
+            MemoryLogBuffer._unseen_counts[entry.level] = (
+                MemoryLogBuffer._unseen_counts.get(entry.level, 0) + 1
+            )
+            unseen: Dict[int, int] = dict(MemoryLogBuffer._unseen_counts)
+
+        if MemoryLogBuffer.archive:
+            MemoryLogBuffer.archive.append(
+                entry.number,
+                entry.created,
+                entry.logger,
+                entry.level,
+                entry.path,
+                entry.line,
+                entry.message,
+            )
+
+        if event_bus.has_subscribers():
+            event_bus.publish(
+                "log", MemoryLogBuffer.get_event_data(entry, unseen)
             )
+
+    @staticmethod
+    def get_event_data(
+        entry: "MemoryLogBuffer.LogEntry", unseen: Dict[int, int]
+    ) -> Dict[str, Any]:
+        """Build the payload of a live update for a new entry, including the
+        number of unseen entries per level."""
+        return {
+            "number": entry.number,
+            "time": entry.time.isoformat(sep=" ", timespec="milliseconds"),
+            "level": entry.level,
+            "logger": entry.logger,
+            "path": entry.path,
+            "line": entry.line,
+            "message": entry.message,
+            "unseen_warnings": unseen.get(WARNING, 0),
+            "unseen_errors": unseen.get(ERROR, 0) + unseen.get(CRITICAL, 0),
+        }
+
+    @staticmethod
+    def open_archive(directory: str, max_segments: int) -> None:
+        """Open the on-disk archive and continue its entry numbering."""
+        MemoryLogBuffer.archive = LogArchive(
+            directory, max_segments=max_segments
         )
-        MemoryLogBuffer.entries = MemoryLogBuffer.entries[
-            -MemoryLogBuffer.capacity :
+        MemoryLogBuffer.entry_count = MemoryLogBuffer.archive.last_number
+        MemoryLogBuffer.seen_number = MemoryLogBuffer.archive.last_number
+
+    @staticmethod
+    def get_snapshot(since: int = 0) -> List[LogEntry]:
+        """Fetch a consistent, ordered snapshot of all entries in the buffer
+        with a number greater than the given sequence cursor."""
+        with MemoryLogBuffer._lock:
+            num_entries: int = len(MemoryLogBuffer.entries)
+            num_newer: int = max(
+                0, min(num_entries, MemoryLogBuffer.entry_count - since)
+            )
+            return list(
+                islice(
+                    MemoryLogBuffer.entries, num_entries - num_newer, None
+                )
+            )
+
+    @staticmethod
+    def get_missed_events(since: int) -> List[Dict[str, Any]]:
+        """Build the live update payloads of all entries still in the buffer
+        with a number greater than the given sequence cursor, e.g. for a
+        client catching up after a reconnect."""
+        entries: List[MemoryLogBuffer.LogEntry] = (
+            MemoryLogBuffer.get_snapshot(since)
+        )
+        with MemoryLogBuffer._lock:
+            unseen: Dict[int, int] = dict(MemoryLogBuffer._unseen_counts)
+        return [
+            MemoryLogBuffer.get_event_data(entry, unseen) for entry in entries
         ]
 
     @staticmethod
-    def get_entries(min_level: int = 0) -> List[LogEntry]:
-        """Fetch all entries with a given minimum level in the buffer."""
-        entries: List[MemoryLogBuffer.LogEntry] = list(
-            filter(lambda x: x.level >= min_level, MemoryLogBuffer.entries)
+    def get_page(
+        min_level: int = 0,
+        page_size: int = LOG_PAGE_SIZE,
+        before: Optional[int] = None,
+        start: float = 0,
+        end: float = float("inf"),
+    ) -> List[LogEntry]:
+        """Fetch one page of entries with a given minimum level, newest first.
+        If set, only entries older than the given entry number and within the
+        given time window (epoch seconds) are returned."""
+        with MemoryLogBuffer._lock:
+            newest_first: Iterator[MemoryLogBuffer.LogEntry] = merge(
+                *(
+                    MemoryLogBuffer._iter_older(entries, before)
+                    for level, entries in (
+                        MemoryLogBuffer._level_entries.items()
+                    )
+                    if level >= min_level
+                ),
+                key=attrgetter("number"),
+                reverse=True,
+            )
+            if start > 0 or end < float("inf"):
+                newest_first = filter(
+                    lambda x: start <= x.created <= end, newest_first
+                )
+            return list(islice(newest_first, page_size))
+
+    @staticmethod
+    def _iter_older(
+        entries: Deque["MemoryLogBuffer.LogEntry"], before: Optional[int]
+    ) -> Iterator["MemoryLogBuffer.LogEntry"]:
+        """Iterate over the entries older than the given entry number, newest
+        first. The start is found by bisecting on the ascending entry numbers,
+        so newer entries are never visited."""
+        pos: int = (
+            len(entries)
+            if before is None
+            else bisect_left(entries, before, key=attrgetter("number"))
         )
-        entries_copy = deepcopy(entries)
+        return (entries[i] for i in range(pos - 1, -1, -1))
 
-        # After fetching them, mark every entry as seen in the original list
-        for entry in entries:
-            entry.is_new = False
-        return list(reversed(entries_copy))
+    @staticmethod
+    def query(
+        start: float = 0,
+        end: float = float("inf"),
+        min_level: int = 0,
+        before: Optional[int] = None,
+        limit: int = LOG_PAGE_SIZE,
+    ) -> List[LogEntry]:
+        """Fetch entries of the given time window (epoch seconds) with a given
+        minimum level, newest first. Uses the on-disk archive, if enabled, or
+        the entries in memory otherwise."""
+        if MemoryLogBuffer.archive:
+            return [
+                MemoryLogBuffer.LogEntry(*fields, ())
+                for fields in MemoryLogBuffer.archive.query(
+                    start, end, min_level, before, limit
+                )
+            ]
+        return MemoryLogBuffer.get_page(min_level, limit, before, start, end)
+
+    @staticmethod
+    def mark_seen(number: int) -> None:
+        """Mark all entries up to the given entry number as seen."""
+        with MemoryLogBuffer._lock:
+            if number <= MemoryLogBuffer.seen_number:
+                return
+            for entry in reversed(MemoryLogBuffer.entries):
+                if entry.number <= MemoryLogBuffer.seen_number:
+                    break
+                if entry.number <= number:
+                    MemoryLogBuffer._unseen_counts[entry.level] -= 1
+            MemoryLogBuffer.seen_number = number
+            unseen: Dict[int, int] = dict(MemoryLogBuffer._unseen_counts)
+
+        if event_bus.has_subscribers():
+            event_bus.publish(
+                "log_seen",
+                {
+                    "seen_number": number,
+                    "unseen_warnings": unseen.get(WARNING, 0),
+                    "unseen_errors": unseen.get(ERROR, 0)
+                    + unseen.get(CRITICAL, 0),
+                },
+            )
 
     @staticmethod
     def get_num_of_entries(
@@ -91,28 +333,94 @@ class MemoryLogBuffer(BufferingHandler):
     ) -> int:
         """Fetch the number of all entries or, if set, all of them with a
         specified level in the buffer."""
-        if level is None:
-            return len(MemoryLogBuffer.entries)
-        return sum(
-            (entry.level >= level if include_lower else entry.level == level)
-            for entry in filter(
-                lambda x: not only_new or x.is_new, MemoryLogBuffer.entries
+        with MemoryLogBuffer._lock:
+            return sum(
+                MemoryLogBuffer._unseen_counts.get(entry_level, 0)
+                if only_new
+                else len(entries)
+                for entry_level, entries in (
+                    MemoryLogBuffer._level_entries.items()
+                )
+                if level is None
+                or entry_level == level
+                or (include_lower and entry_level >= level)
             )
-        )
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Wrapper around logging.handlers.QueueHandler, which hands over records
+    to the queue without formatting them. If the queue is full, records are
+    either dropped immediately or after blocking for a given timeout."""
+
+    def __init__(
+        self, queue: "Queue[LogRecord]", block: bool, timeout: float
+    ) -> None:
+        QueueHandler.__init__(self, queue)  # type: ignore
+        self.block: bool = block
+        self.timeout: float = timeout
+        self.dropped: int = 0
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        """Override prepare method of QueueHandler; formatting is deferred to
+        the listener thread."""
+        return record
+
+    def enqueue(self, record: LogRecord) -> None:
+        """Override enqueue method of QueueHandler."""
+        try:
+            self.queue.put(record, self.block, self.timeout)  # type: ignore
+        except Full:
+            self.dropped += 1
+
+
+# All loggers share one queue, which is processed by one single listener
+# thread feeding stdout and the memory buffer
+_queue: "Queue[LogRecord]" = Queue(LOG_QUEUE_SIZE)
+_queue_handler: DroppingQueueHandler = DroppingQueueHandler(
+    _queue, LOG_QUEUE_POLICY == "block", LOG_QUEUE_TIMEOUT.total_seconds()
+)
+_stdout_handler: StreamHandler = StreamHandler(stdout)
+_stdout_handler.setFormatter(Formatter("%(levelname)s:%(name)s:%(message)s"))
+_listener: QueueListener = QueueListener(
+    _queue, _stdout_handler, MemoryLogBuffer(), respect_handler_level=True
+)
+
+if LOG_ARCHIVE_DIR:
+    MemoryLogBuffer.open_archive(LOG_ARCHIVE_DIR, LOG_ARCHIVE_SEGMENTS)
+
+
+def _stop_listener() -> None:
+    """Process all queued records and stop the listener thread."""
+    try:
+        _listener.stop()
+    except Full:
+        pass
+    if MemoryLogBuffer.archive:
+        MemoryLogBuffer.archive.close()
+
+
+def get_num_of_dropped_records() -> int:
+    """Fetch the number of log records dropped due to a full queue."""
+    return _queue_handler.dropped
 
 
 def get_logger(name: str, log_level: int = LOG_LEVEL) -> Logger:
     """Set up and return our desired logger."""
     logger: logging.Logger = logging.getLogger(name)
-
-    memory_handler = MemoryLogBuffer()
-    stdout_handler: StreamHandler = StreamHandler(stdout)
-    stdout_handler.setFormatter(
-        Formatter("%(levelname)s:%(name)s:%(message)s")
-    )
-
     logger.setLevel(log_level)
-    logger.addHandler(stdout_handler)
-    logger.addHandler(memory_handler)
+    if _queue_handler not in logger.handlers:
+        logger.addHandler(_queue_handler)
 
     return logger
+
+
+# The listener runs for the whole lifetime of the process
+_listener.start()
+atexit.register(_stop_listener)
+
+if LOG_QUEUE_POLICY not in ("drop", "block"):
+    get_logger(__name__).warning(
+        "Unknown log queue policy '%s'; dropping records if the queue is "
+        "full.",
+        LOG_QUEUE_POLICY,
+    )
@@ -9,6 +9,8 @@ web frontend for webbrowser based control.
 
 import signal
 from threading import Thread
+from types import FrameType
+from typing import Optional
 
 from backend import Backend
 from constants import (
@@ -50,15 +52,23 @@ def main():
     frontend_thread.start()
     logger.debug("Frontend thread set up.")
 
+    def on_exit(
+        _sig: Optional[int] = None, _frame: Optional[FrameType] = None
+    ) -> None:
+        """Drain pending requests before cleaning up."""
+        frontend.stop()
+        backend.stop()
+        light.on_exit()
+
     # Run until interrupted...
     logger.info("Setup finished. Running until interrupted.")
-    signal.signal(signal.SIGTERM, light.on_exit)
+    signal.signal(signal.SIGTERM, on_exit)
     try:
         signal.pause()
         logger.debug("SIGTERM triggered.")
     except KeyboardInterrupt:
         logger.debug("KeyboardInterrupt triggered.")
-        light.on_exit()
+        on_exit()
 
     logger.info("Python script finished.")
 
@@ -2,18 +2,44 @@
 
 """Python module which handles HomeOfficeLight remotes."""
 
-from datetime import datetime
-from json import dumps
+from datetime import datetime, timedelta
+from enum import Enum
 from re import match
-from socket import AF_INET, SOCK_STREAM, socket, timeout
-from typing import List, Optional, Union
+from socket import (
+    AF_INET,
+    IPPROTO_TCP,
+    SO_KEEPALIVE,
+    SOCK_STREAM,
+    SOL_SOCKET,
+    TCP_NODELAY,
+    socket,
+)
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, List, Optional, Tuple, Union
 
-from constants import PORT_REMOTE, REMOTE_EXP_TIMEOUT
+from broadcast import Broadcast
+from constants import (
+    PORT_REMOTE,
+    REMOTE_BREAKER_THRESHOLD,
+    REMOTE_EXP_TIMEOUT,
+    REMOTE_KEEP_ALIVE,
+    REMOTE_RETRY_DELAY_MAX,
+    REMOTE_RETRY_DELAY_MIN,
+)
 from logger import get_logger
 
 logger = get_logger(__name__)
 
 
+class BreakerState(Enum):
+    """Enumeration of all states of a remote's circuit breaker."""
+
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
 class HomeOfficeLightRemote:
     """Subclass for simple handling of HomeOfficeLight remotes."""
 
@@ -25,10 +51,31 @@ class HomeOfficeLightRemote:
         self.ip_addr: str = ip_addr
         self.port: int = port
         self.skip_once: bool = skip_once
+        self.announce: bool = False
         self.rx_count: int = 0
         self.tx_count: int = 0
         self.tx_errors: int = 0
+        self.tx_latency: Optional[timedelta] = None
+        self.connect_latency: Optional[timedelta] = None
+        self.send_latency: Optional[timedelta] = None
+        self.reconnects: int = 0
+        self.tx_superseded: int = 0
+        self.last_tx: Optional[datetime] = None
         self.last_contact: Optional[datetime]
+        self._sock: Optional[socket] = None
+        self._sock_lock: Lock = Lock()
+        self._outbox: Optional[Broadcast] = None
+        self._outbox_busy: bool = False
+        self._outbox_lock: Lock = Lock()
+        self.breaker: BreakerState = BreakerState.CLOSED
+        self.failures: int = 0
+        self.retry_at: Optional[datetime] = None
+        self._retry_id: int = 0
+        self._request_head: bytes = (
+            f"GET /remote HTTP/1.1\n"
+            f"Host: {ip_addr}\n"
+            + ("Connection: keep-alive\n" if REMOTE_KEEP_ALIVE else "")
+        ).encode("ascii")
 
         logger.debug("%s initialized.", self)
 
@@ -49,48 +96,238 @@ class HomeOfficeLightRemote:
         port: Union[str, int] = groups[1] or default_port
         return HomeOfficeLightRemote(ip_addr, int(port))
 
-    def send_update(
-        self, state_str: str, remotes: List["HomeOfficeLightRemote"]
-    ) -> None:
-        """Send a HTTP request to the remote including the current HomeOfficeLight
-        state."""
+    def queue_update(self, update: Broadcast) -> bool:
+        """Put an update into the outbox of this remote, which only holds the
+        latest one. A pending update which has not been sent yet is replaced.
+        Returns True if the caller must schedule a call of flush_updates()."""
         # Skip if this remote has triggered the state change or is disabled
         if not self.is_active():
-            return
+            return False
 
         if self.skip_once:
             logger.debug("Skipping update for %s once.", self)
             self.skip_once = False
-            return
-
-        # The payload must be sent as one-line JSON string (with trailing \n)
-        payload: str = dumps(
-            {
-                "state": state_str,
-                "remotes": [remote.ip_addr for remote in remotes],
-            },
-            indent=None,
-        )
-        http_request: str = (
-            f"GET /remote HTTP/1.1\n"
-            f"Host: {self.ip_addr}\n"
-            "\n"
-            f"{payload}\n"
-        )
+            return False
+
+        with self._outbox_lock:
+            if self._outbox is not None:
+                logger.debug("Pending update for %s superseded.", self)
+                self.tx_superseded += 1
+            self._outbox = update
+            if self._outbox_busy:
+                return False
+            self._outbox_busy = True
+            return True
+
+    def flush_updates(
+        self, schedule_retry: Callable[[timedelta, int], Any]
+    ) -> None:
+        """Send the latest update from the outbox until it stays empty. Updates
+        queued in the meantime are picked up by the same call, so there is
+        never more than one transmission to a remote in flight.
+
+        If a transmission fails, the update is kept and a retry is requested
+        via the given callback. Retries use the minimum delay until the
+        circuit breaker opens, and an exponentially growing delay afterwards.
+        The outbox stays busy until then, so new updates only replace the
+        pending one without causing any transmission.
+
+        If the remote is not active anymore, the pending update is dropped
+        without touching the breaker, since nothing has been sent."""
+        while True:
+            with self._outbox_lock:
+                update: Optional[Broadcast] = self._outbox
+                self._outbox = None
+                if update is None or not self.is_active():
+                    self._outbox_busy = False
+                    return
+                if self.breaker == BreakerState.OPEN:
+                    self.breaker = BreakerState.HALF_OPEN
+            try:
+                success: bool = self.send_update(update)
+            except Exception:  # pylint: disable=W0703
+                logger.exception("Sending update to %s failed.", self)
+                success = False
+
+            with self._outbox_lock:
+                if success:
+                    if self.breaker != BreakerState.CLOSED:
+                        logger.info("%s is reachable again.", self)
+                    self.breaker = BreakerState.CLOSED
+                    self.failures = 0
+                    continue
+
+                # Keep the update for the retry unless it has been replaced
+                if self._outbox is None:
+                    self._outbox = update
+                self.failures += 1
+                if self.breaker == BreakerState.HALF_OPEN:
+                    self.breaker = BreakerState.OPEN
+                elif self.failures >= REMOTE_BREAKER_THRESHOLD:
+                    logger.warning(
+                        "%s failed %d times in a row; skipping it until the "
+                        "next probe.",
+                        self,
+                        self.failures,
+                    )
+                    self.breaker = BreakerState.OPEN
+                delay: timedelta = min(
+                    REMOTE_RETRY_DELAY_MIN
+                    * 2 ** max(0, self.failures - REMOTE_BREAKER_THRESHOLD),
+                    REMOTE_RETRY_DELAY_MAX,
+                )
+                self.retry_at = datetime.now() + delay
+                self._retry_id += 1
+                schedule_retry(delay, self._retry_id)
+                return
+
+    def claim_retry(self, retry_id: int) -> bool:
+        """Check if a requested retry is still due and mark it as taken. A
+        retry becomes obsolete once the remote has polled in the meantime."""
+        with self._outbox_lock:
+            if self.retry_at is None or retry_id != self._retry_id:
+                return False
+            self.retry_at = None
+            return True
+
+    def discard_updates(self) -> None:
+        """Drop the pending update and any requested retry, e.g. since the
+        remote has been removed."""
+        with self._outbox_lock:
+            self._outbox = None
+            self._retry_id += 1
+            if self.retry_at is not None:
+                self.retry_at = None
+                self._outbox_busy = False
+
+    def reset_health(self) -> None:
+        """Close the circuit breaker, since the remote has just contacted us
+        and received the current state with the response. A pending retry is
+        dropped along with the outdated update."""
+        with self._outbox_lock:
+            if self.breaker != BreakerState.CLOSED:
+                logger.info("%s has polled; closing circuit breaker.", self)
+            self.breaker = BreakerState.CLOSED
+            self.failures = 0
+            if self.retry_at is not None:
+                self.retry_at = None
+                self._outbox = None
+                self._outbox_busy = False
+
+    def send_update(self, update: Broadcast) -> bool:
+        """Send a HTTP request to the remote including the current HomeOfficeLight
+        state. Returns False if the transmission failed."""
+        # Only the request head is specific to this remote; the shared body
+        # is sent directly from the broadcast's buffer without copying it
+        parts: List[memoryview] = [
+            memoryview(self._request_head),
+            memoryview(update.body),
+        ]
+        success: bool = False
+        with self._sock_lock:
+            start: float = monotonic()
+            connected: float = start
+            try:
+                reused: bool = self._connect()
+                connected = monotonic()
+                try:
+                    self._send_parts(self._sock, parts)  # type: ignore
+                except OSError:
+                    if not reused:
+                        raise
+                    # The pooled connection broke, so retry on a new one
+                    self._close()
+                    self.reconnects += 1
+                    start = monotonic()
+                    self._connect()
+                    connected = monotonic()
+                    self._send_parts(self._sock, parts)  # type: ignore
+                logger.info("State update sent to %s.", self)
+                success = True
+
+            except OSError as err:
+                logger.error(
+                    "Could not send status update to %s (%s).", self, err
+                )
+                self.tx_errors += 1
+                self._close()
+
+            finally:
+                if not REMOTE_KEEP_ALIVE:
+                    self._close()
+                done: float = monotonic()
+                self.tx_count += 1
+                self.connect_latency = timedelta(seconds=connected - start)
+                self.send_latency = timedelta(seconds=done - connected)
+                self.tx_latency = timedelta(seconds=done - start)
+                self.last_tx = datetime.now()
+        return success
+
+    @staticmethod
+    def _send_parts(sock: socket, parts: List[memoryview]) -> None:
+        """Send all buffers with as few system calls as possible, resuming
+        after partial writes."""
+        while parts:
+            sent: int = sock.sendmsg(parts)
+            while sent:
+                if sent >= len(parts[0]):
+                    sent -= len(parts[0])
+                    parts = parts[1:]
+                else:
+                    parts = [parts[0][sent:]] + parts[1:]
+                    sent = 0
+
+    def _connect(self) -> bool:
+        """Make sure there is an open connection to the remote. A pooled
+        connection is only reused if the remote has not closed it in the
+        meantime; otherwise, a new one is set up transparently. Returns True
+        if the pooled connection is reused."""
+        if self._sock is not None:
+            if not self._is_closed(self._sock):
+                return True
+            logger.debug("Connection to %s closed by remote.", self)
+            self._close()
+            self.reconnects += 1
+
         sock: socket = socket(AF_INET, SOCK_STREAM)
         sock.settimeout(self._SOCKET_TIMEOUT_SEC)
+        sock.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+        sock.setsockopt(SOL_SOCKET, SO_KEEPALIVE, 1)
         try:
             sock.connect((self.ip_addr, self.port))
-            sock.sendall(http_request.encode("ascii"))
-            logger.info("State update sent to %s.", self)
-
-        except (timeout, ConnectionRefusedError) as err:
-            logger.error("Could not send status update to %s (%s).", self, err)
-            self.tx_errors += 1
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        return False
 
+    @staticmethod
+    def _is_closed(sock: socket) -> bool:
+        """Check without blocking if the remote has closed (or half-closed)
+        the connection. Any pending responses are discarded."""
+        timeout: Optional[float] = sock.gettimeout()
+        sock.settimeout(0)
+        try:
+            while True:
+                if not sock.recv(1024):
+                    return True
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
         finally:
-            sock.close()
-            self.tx_count += 1
+            sock.settimeout(timeout)
+
+    def close(self) -> None:
+        """Close the pooled connection to the remote, if any."""
+        with self._sock_lock:
+            self._close()
+
+    def _close(self) -> None:
+        """Close the pooled connection without locking."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
 
     def set_timestamp(self, last_contact: Optional[datetime]) -> None:
         """Set the timestamp of this remote's last contact with us."""
@@ -105,6 +342,11 @@ class HomeOfficeLightRemote:
             else self.last_contact + REMOTE_EXP_TIMEOUT >= datetime.now()
         )
 
+    @property
+    def key(self) -> Tuple[str, int]:
+        """Unique key of this remote, consisting of IP address and port."""
+        return (self.ip_addr, self.port)
+
     def __repr__(self) -> str:
         """Overload repr operator for a serialized representation for debugging
         purposes."""
@@ -118,4 +360,8 @@ class HomeOfficeLightRemote:
         """Compare remotes by IP address and port only."""
         if not isinstance(other, HomeOfficeLightRemote):
             return NotImplemented
-        return self.ip_addr == other.ip_addr and self.port == other.port
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        """Hash remotes by IP address and port only, matching __eq__."""
+        return hash(self.key)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+"""Python module with immutable snapshots of the HomeOfficeLight, which can be
+read from any thread without locking."""
+
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from heapq import heapify, heappop, heappush
+from typing import Dict, List, Optional, Tuple
+
+from constants import REMOTE_EXP_TIMEOUT
+from remote import BreakerState, HomeOfficeLightRemote
+from states import States
+
+
+@dataclass(frozen=True)
+class RemoteView:
+    """Dataclass which holds a read-only copy of one single remote."""
+
+    ip_addr: str
+    port: int
+    active: bool
+    announce: bool
+    last_contact: Optional[datetime]
+    expires: Optional[datetime]
+    rx_count: int
+    tx_count: int
+    tx_errors: int
+    tx_superseded: int
+    tx_latency: Optional[timedelta]
+    connect_latency: Optional[timedelta]
+    send_latency: Optional[timedelta]
+    reconnects: int
+    last_tx: Optional[datetime]
+    breaker: BreakerState
+    failures: int
+    retry_at: Optional[datetime]
+
+    @property
+    def breaker_name(self) -> str:
+        """Get the circuit breaker state as a lowercase string."""
+        return self.breaker.name.lower().replace("_", "-")
+
+    @staticmethod
+    def create(remote: HomeOfficeLightRemote, now: datetime) -> "RemoteView":
+        """Copy the current properties of a remote."""
+        last_contact: Optional[datetime] = getattr(
+            remote, "last_contact", None
+        )
+        expires: Optional[datetime] = (
+            last_contact + REMOTE_EXP_TIMEOUT if last_contact else None
+        )
+        return RemoteView(
+            remote.ip_addr,
+            remote.port,
+            expires is not None and expires >= now,
+            remote.announce,
+            last_contact,
+            expires,
+            remote.rx_count,
+            remote.tx_count,
+            remote.tx_errors,
+            remote.tx_superseded,
+            remote.tx_latency,
+            remote.connect_latency,
+            remote.send_latency,
+            remote.reconnects,
+            remote.last_tx,
+            remote.breaker,
+            remote.failures,
+            remote.retry_at,
+        )
+
+
+class RemoteViews:
+    """Helper class which keeps the views of all remotes along with their
+    aggregated counters. Only the views of changed remotes are rebuilt, so
+    publishing a change of one single remote does not depend on the number of
+    remotes. Must only be used on the dispatcher thread."""
+
+    def __init__(self) -> None:
+        self.views: Dict[Tuple[str, int], RemoteView] = {}
+        self.num_active: int = 0
+        self.rx_count: int = 0
+        self.tx_count: int = 0
+        self.tx_errors: int = 0
+        # Expiry times of active remotes; outdated entries are dropped lazily
+        self._expiries: List[Tuple[datetime, Tuple[str, int]]] = []
+
+    def update(self, remote: HomeOfficeLightRemote, now: datetime) -> None:
+        """Rebuild the view of an added or changed remote."""
+        view: RemoteView = RemoteView.create(remote, now)
+        self._replace(remote.key, view)
+        if view.active and view.expires:
+            heappush(self._expiries, (view.expires, remote.key))
+            if len(self._expiries) > 2 * len(self.views) + 16:
+                self._expiries = [
+                    (x.expires, key)
+                    for key, x in self.views.items()
+                    if x.active and x.expires
+                ]
+                heapify(self._expiries)
+
+    def remove(self, key: Tuple[str, int]) -> None:
+        """Drop the view of a removed remote."""
+        self._replace(key, None)
+
+    def expire(self, now: datetime) -> None:
+        """Mark all views of remotes which have expired until now as
+        inactive."""
+        while True:
+            expires: Optional[datetime] = self.next_expiry
+            if expires is None or expires >= now:
+                return
+            key: Tuple[str, int] = heappop(self._expiries)[1]
+            self._replace(key, replace(self.views[key], active=False))
+
+    @property
+    def next_expiry(self) -> Optional[datetime]:
+        """Get the point in time the next active remote expires."""
+        while self._expiries:
+            expires, key = self._expiries[0]
+            view: Optional[RemoteView] = self.views.get(key)
+            if view and view.active and view.expires == expires:
+                return expires
+            heappop(self._expiries)
+        return None
+
+    def _replace(
+        self, key: Tuple[str, int], view: Optional[RemoteView]
+    ) -> None:
+        """Replace (or drop) the view of a remote and update the counters."""
+        old: Optional[RemoteView] = self.views.get(key)
+        if view is None:
+            self.views.pop(key, None)
+        else:
+            # Existing keys keep their position, i.e. the registration order
+            self.views[key] = view
+            self._count(view, 1)
+        if old is not None:
+            self._count(old, -1)
+
+    def _count(self, view: RemoteView, sign: int) -> None:
+        """Add a view to (or subtract it from) the counters."""
+        self.num_active += sign * int(view.active)
+        self.rx_count += sign * view.rx_count
+        self.tx_count += sign * view.tx_count
+        self.tx_errors += sign * view.tx_errors
+
+
+@dataclass(frozen=True)
+class LightSnapshot:
+    """Dataclass which holds a consistent, read-only copy of the whole
+    HomeOfficeLight. A new snapshot is created after every change."""
+
+    state: States
+    version: int
+    start_time: datetime
+    total_state_changes: int
+    remotes: Tuple[RemoteView, ...]
+    num_remotes_active: int
+    num_remotes_inactive: int
+    rx_count: int
+    tx_count: int
+    tx_errors: int
+
+    @property
+    def state_name(self) -> str:
+        """Get the state as a lowercase string."""
+        return str(self.state.name).lower()
+
+    @staticmethod
+    def create(
+        state: States,
+        version: int,
+        start_time: datetime,
+        total_state_changes: int,
+        remotes: RemoteViews,
+    ) -> "LightSnapshot":
+        """Copy the given properties into a new snapshot. The views of the
+        remotes are shared with the previous snapshot."""
+        return LightSnapshot(
+            state,
+            version,
+            start_time,
+            total_state_changes,
+            tuple(remotes.views.values()),
+            remotes.num_active,
+            len(remotes.views) - remotes.num_active,
+            remotes.rx_count,
+            remotes.tx_count,
+            remotes.tx_errors,
+        )
@@ -1,16 +1,140 @@
-// Load auto-refresh functionality when page is loaded
+// Patch the current page in place with live updates pushed by the server
+function setBadge(id, context, number, hide_empty = true) {
+    const badge = document.getElementById(id);
+    if (!badge)
+        return;
+    badge.className = "badge rounded-pill bg-" + context + (number > 0 || !hide_empty ? "" : " d-none");
+    badge.textContent = number;
+}
+
+function setText(id, text) {
+    const element = document.getElementById(id);
+    if (element)
+        element.textContent = text;
+}
+
+function onState(data) {
+    const light = document.getElementById("homeofficelight");
+    if (light)
+        light.className = light.className.replace(/^\S+/, data.state);
+    document.querySelectorAll("a[data-state]").forEach((link) => {
+        link.classList.toggle("active", link.dataset.state == data.state);
+        link.classList.toggle("disabled", data.disabled.includes(link.dataset.state));
+    });
+    setText("total-state-changes", data.total_state_changes);
+}
+
+function onRemotes(data) {
+    setBadge("badge-remotes", "secondary", data.active, false);
+    setText("remotes-active", data.active);
+    setText("remotes-inactive", data.inactive);
+    setText("remotes-rx-count", data.rx_count);
+    setText("remotes-tx-count", data.tx_count);
+    setText("remotes-tx-errors", data.tx_errors);
+
+    scheduleRemotesTableUpdate();
+}
+
+// Remotes events may arrive for every single poll of a remote, so the table
+// is re-rendered at most once per interval, and not at all while hidden
+const remotesTableInterval = 5000;
+let remotesTableTimer = null;
+let remotesTablePending = false;
+let remotesTableUpdated = 0;
+
+function scheduleRemotesTableUpdate() {
+    if (!document.getElementById("remotes-table"))
+        return;
+    remotesTablePending = true;
+    if (remotesTableTimer || document.hidden)
+        return;
+    const delay = Math.max(0, remotesTableUpdated + remotesTableInterval - Date.now());
+    remotesTableTimer = setTimeout(updateRemotesTable, delay);
+}
+
+function updateRemotesTable() {
+    remotesTableTimer = null;
+    if (document.hidden)
+        return;
+    remotesTablePending = false;
+    remotesTableUpdated = Date.now();
+
+    // Re-render the remotes table only, keeping the rest of the page intact
+    fetch(window.location.pathname)
+        .then((response) => response.text())
+        .then((html) => {
+            const page = new DOMParser().parseFromString(html, "text/html");
+            const update = page.getElementById("remotes-table");
+            const table = document.getElementById("remotes-table");
+            if (update && table)
+                table.innerHTML = update.innerHTML;
+        });
+}
+
+document.addEventListener("visibilitychange", (event) => {
+    if (!document.hidden && remotesTablePending)
+        scheduleRemotesTableUpdate();
+});
+
+function onLogBadges(data) {
+    if (data.unseen_errors > 0)
+        setBadge("badge-log", "danger", data.unseen_errors);
+    else
+        setBadge("badge-log", "warning", data.unseen_warnings);
+}
+
+function onLog(data) {
+    onLogBadges(data);
+
+    // Prepend the entry if the newest page of a matching filter is shown
+    const table = document.getElementById("log-entries");
+    if (!table || table.dataset.live != "true" || data.level < table.dataset.minLevel)
+        return;
+    const mapping = JSON.parse(table.dataset.logMapping)[data.level] || [String(data.level), "secondary"];
+    const row = document.createElement("tr");
+    row.className = "table-primary";
+    row.innerHTML =
+        '<th scope="row"></th><td></td>' +
+        '<td><span class="badge rounded-pill"></span></td>' +
+        '<td class="fw-bold"></td>' +
+        '<td><span></span> <span class="small text-muted"></span></td>';
+    row.children[0].textContent = data.number;
+    row.children[1].textContent = data.time;
+    row.children[2].firstChild.classList.add("bg-" + mapping[1]);
+    row.children[2].firstChild.textContent = mapping[0].toUpperCase();
+    row.children[3].textContent = data.logger;
+    row.children[4].children[0].textContent = data.message;
+    row.children[4].children[1].textContent = "– " + data.path + ":" + data.line;
+    table.prepend(row);
+    while (table.rows.length > table.dataset.pageSize)
+        table.deleteRow(-1);
+}
+
+function openEventSource() {
+    const source = new EventSource("/events");
+    const handlers = {
+        "state": onState,
+        "remotes": onRemotes,
+        "log": onLog,
+        "log_seen": onLogBadges,
+    };
+    for (const [name, handler] of Object.entries(handlers))
+        source.addEventListener(name, (event) => handler(JSON.parse(event.data)));
+    source.addEventListener("reload", (event) => window.location.reload(1));
+    return source;
+}
+
+// Load live update functionality when page is loaded
 window.addEventListener("load", (event) => {
     const cookie_name = "EnableAutoRefresh";
     const cookie_days = 30;
-    const timeout_s = 15;
     const checkbox = document.autoRefreshForm.autoRefreshCheckbox;
+    let source = null;
 
-    // Set checkbox state and run initial timer
+    // Set checkbox state and connect initially
     if (getCookie(cookie_name) != "no") {
         checkbox.checked = true;
-        autoRefreshTimeout = setInterval(function() {
-            window.location.reload(1);
-        }, timeout_s * 1000);
+        source = openEventSource();
     } else {
         checkbox.checked = false;
     }
@@ -18,13 +142,12 @@ window.addEventListener("load", (event) => {
     // Set checkbox event listener
     checkbox.addEventListener("change", (event) => {
         if (event.currentTarget.checked) {
-            autoRefreshTimeout = setInterval(function() {
-                window.location.reload(1);
-            }, timeout_s * 1000);
+            source = openEventSource();
             setCookie(cookie_name, "yes", cookie_days);
         } else {
-            if (autoRefreshTimeout)
-                clearInterval(autoRefreshTimeout);
+            if (source)
+                source.close();
+            source = null;
             setCookie(cookie_name, "no", cookie_days);
         }
     })
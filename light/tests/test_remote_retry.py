@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""Tests for the retries and the circuit breaker of unreachable remotes.
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+
+import sys
+import unittest
+from datetime import timedelta
+from os import environ as env
+from os.path import abspath, dirname, join
+from socket import AF_INET, SOCK_STREAM, socket
+from time import monotonic, sleep
+from typing import Callable
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), "src"))
+env.setdefault("HARDWARE_BACKEND", "sim")
+env.setdefault("LOG_LEVEL", "critical")
+env.setdefault("GIT_VERSION", "test")
+
+# pylint: disable=C0413,E0401
+import remote as remote_module  # noqa: E402
+from home_office_light import HomeOfficeLight  # noqa: E402
+from remote import BreakerState, HomeOfficeLightRemote  # noqa: E402
+
+TIMEOUT_SEC: float = 5
+
+
+def refused_port() -> int:
+    """Get a local port nobody is listening on."""
+    with socket(AF_INET, SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def wait_until(condition: Callable[[], bool]) -> bool:
+    """Poll a condition until it is met or the timeout has elapsed."""
+    deadline: float = monotonic() + TIMEOUT_SEC
+    while not condition():
+        if monotonic() > deadline:
+            return False
+        sleep(0.01)
+    return True
+
+
+class RemoteRetryTest(unittest.TestCase):
+    """Drive a real HomeOfficeLight against a remote refusing connections."""
+
+    def setUp(self) -> None:
+        self._delay_min: timedelta = remote_module.REMOTE_RETRY_DELAY_MIN
+        remote_module.REMOTE_RETRY_DELAY_MIN = timedelta(milliseconds=20)
+        self.light: HomeOfficeLight = HomeOfficeLight()
+        self.ref: HomeOfficeLightRemote = HomeOfficeLightRemote(
+            "127.0.0.1", refused_port()
+        )
+        self.light.add_or_update_remote(self.ref).result(TIMEOUT_SEC)
+        self.remote: HomeOfficeLightRemote = self.light.get_remote(
+            self.ref
+        )  # type: ignore
+
+    def tearDown(self) -> None:
+        self.light.on_exit()
+        remote_module.REMOTE_RETRY_DELAY_MIN = self._delay_min
+
+    def test_deleted_remote_is_not_retried(self) -> None:
+        """A pending retry must be dropped once the remote is removed."""
+        self.light.set_state("call").result(TIMEOUT_SEC)
+        self.assertTrue(wait_until(lambda: self.remote.failures >= 2))
+
+        self.light.delete_remote(self.ref).result(TIMEOUT_SEC)
+        self.assertIsNone(self.light.get_remote(self.ref))
+        sleep(0.1)
+        tx_count: int = self.remote.tx_count
+        sleep(0.5)
+        self.assertEqual(self.remote.tx_count, tx_count)
+        self.assertIsNone(self.remote.retry_at)
+
+    def test_breaker_opens_once(self) -> None:
+        """Only the transition to an open breaker is warned about, not every
+        failed probe afterwards."""
+        with self.assertLogs("remote", "WARNING") as logs:
+            self.light.set_state("call").result(TIMEOUT_SEC)
+            self.assertTrue(
+                wait_until(
+                    lambda: self.remote.failures
+                    >= remote_module.REMOTE_BREAKER_THRESHOLD + 2
+                )
+            )
+        self.assertEqual(self.remote.breaker, BreakerState.OPEN)
+        self.assertEqual(
+            sum(1 for line in logs.output if "times in a row" in line), 1
+        )
+
+    def test_poll_closes_breaker(self) -> None:
+        """A poll of the remote closes the breaker and drops the retry."""
+        remote_module.REMOTE_RETRY_DELAY_MIN = timedelta(seconds=2)
+        threshold: int = remote_module.REMOTE_BREAKER_THRESHOLD
+        remote_module.REMOTE_BREAKER_THRESHOLD = 1
+        try:
+            self.light.set_state("call").result(TIMEOUT_SEC)
+            self.assertTrue(
+                wait_until(lambda: self.remote.retry_at is not None)
+            )
+        finally:
+            remote_module.REMOTE_BREAKER_THRESHOLD = threshold
+        self.assertEqual(self.remote.breaker, BreakerState.OPEN)
+
+        self.light.on_remote_request(self.ref).result(TIMEOUT_SEC)
+        self.assertEqual(self.remote.breaker, BreakerState.CLOSED)
+        self.assertEqual(self.remote.failures, 0)
+        self.assertIsNone(self.remote.retry_at)
+
+    def test_inactive_remote_keeps_breaker(self) -> None:
+        """A retry of an expired remote drops the update without closing the
+        breaker, since nothing has been sent."""
+        remote_module.REMOTE_RETRY_DELAY_MIN = timedelta(milliseconds=300)
+        threshold: int = remote_module.REMOTE_BREAKER_THRESHOLD
+        remote_module.REMOTE_BREAKER_THRESHOLD = 1
+        try:
+            self.light.set_state("call").result(TIMEOUT_SEC)
+            self.assertTrue(
+                wait_until(lambda: self.remote.retry_at is not None)
+            )
+        finally:
+            remote_module.REMOTE_BREAKER_THRESHOLD = threshold
+        tx_count: int = self.remote.tx_count
+        self.remote.set_timestamp(None)
+
+        self.assertTrue(wait_until(lambda: self.remote.retry_at is None))
+        sleep(0.1)
+        self.assertEqual(self.remote.tx_count, tx_count)
+        self.assertEqual(self.remote.breaker, BreakerState.OPEN)
+        self.assertEqual(self.remote.failures, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""Reference listener for the UDP state announcements of the HomeOfficeLight.
+
+This script receives the datagrams sent if ANNOUNCE_ADDRESS is configured and
+prints every new state. Repetitions of the same version are ignored. Real
+remotes should register with /state/get?remote&announce so they are not sent
+TCP updates anymore.
+
+Usage: python tools/announce_listener.py [--address 239.0.0.42] [--port 9002]
+Pass a broadcast address (e.g. 192.168.0.255) or omit --address to receive
+broadcasts only.
+"""
+
+import json
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from ipaddress import IPv4Address
+from socket import (
+    AF_INET,
+    INADDR_ANY,
+    IP_ADD_MEMBERSHIP,
+    IPPROTO_IP,
+    SO_REUSEADDR,
+    SOCK_DGRAM,
+    SOL_SOCKET,
+    inet_aton,
+    socket,
+)
+from struct import pack
+from typing import Any, Dict, Optional
+
+
+def open_socket(address: Optional[str], port: int) -> socket:
+    """Bind a UDP socket and join the multicast group, if any."""
+    sock: socket = socket(AF_INET, SOCK_DGRAM)
+    sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+    sock.bind(("", port))
+    if address and IPv4Address(address).is_multicast:
+        membership: bytes = pack("4sL", inet_aton(address), INADDR_ANY)
+        sock.setsockopt(IPPROTO_IP, IP_ADD_MEMBERSHIP, membership)
+    return sock
+
+
+def main() -> None:
+    """Print every newly announced state."""
+    parser: ArgumentParser = ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--address", help="multicast group or broadcast address"
+    )
+    parser.add_argument("--port", type=int, default=9002)
+    args: Namespace = parser.parse_args()
+
+    sock: socket = open_socket(args.address, args.port)
+    last_version: Optional[int] = None
+    while True:
+        data, sender = sock.recvfrom(2048)
+        try:
+            content: Dict[str, Any] = json.loads(data)
+            version: int = int(content["v"])
+            state: str = str(content["s"])
+        except (ValueError, KeyError, TypeError):
+            print(f"Invalid datagram from {sender[0]}: {data!r}")
+            continue
+
+        # The version starts over after a restart, so only skip repetitions
+        if version == last_version:
+            continue
+        last_version = version
+        remotes: str = (
+            ", ".join(content["r"]) if "r" in content else "not included"
+        )
+        print(
+            f"{datetime.now():%F %T} {sender[0]}: state {state} "
+            f"(version {version}, remotes: {remotes})",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass